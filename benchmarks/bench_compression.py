@@ -0,0 +1,58 @@
+"""
+Compares file size, write and scan throughput of a bucket of large texts with and without compression.
+
+    python -m benchmarks.bench_compression [rows]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from os import path
+
+from litedb import Repository, Field
+
+WORDS = ['order', 'shipped', 'customer', 'invoice', 'payment', 'pending', 'warehouse', 'returned']
+
+
+def document(i: int) -> str:
+    words = random.Random(i).choices(WORDS, k=400)
+    return ' '.join(words)
+
+
+def run(compression, rows: int):
+    with tempfile.TemporaryDirectory() as temp:
+        file_path = path.join(temp, 'bench.ldb')
+        with Repository(file_path) as repo:
+            bucket = repo.create_bucket('bench', [
+                Field('id', is_key=True),
+                Field('title'),
+                Field('body', compression=compression),
+            ])
+            start = time.perf_counter()
+            for i in range(0, rows, 100):
+                bucket.save_all({'id': j, 'title': f'doc{j}', 'body': document(j)} for j in range(i, i + 100))
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            sum(len(item['body']) for item in bucket.all())
+            scan_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            sum(1 for _ in bucket.all(fields=['id', 'title']))
+            projected_time = time.perf_counter() - start
+        size = os.path.getsize(file_path)
+    print(
+        f'{compression or "none":<6} size {size / 2 ** 20:>8.1f}MB   writes {rows / write_time:>9.0f}/s   '
+        f'scan {rows / scan_time:>9.0f}/s   scan without body {rows / projected_time:>9.0f}/s'
+    )
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    for compression in [None, 'zlib', 'lzma']:
+        run(compression, rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares counter updates with get and save against server-side increments, single and batched.
+
+    python -m benchmarks.bench_increment [rows] [updates]
+"""
+import random
+import sys
+import tempfile
+import time
+from os import path
+
+from litedb import Repository, Field
+
+
+def measure(name: str, update, updates: int):
+    start = time.perf_counter()
+    update()
+    elapsed = time.perf_counter() - start
+    print(f'{name:<24} {elapsed:>8.2f}s  {updates / elapsed:>10.0f} updates/s')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    updates = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    with tempfile.TemporaryDirectory() as temp:
+        with Repository(path.join(temp, 'bench.ldb')) as repo:
+            bucket = repo.create_bucket('bench', [
+                Field('id', is_key=True),
+                Field('name'),
+                Field('bio'),
+                Field('views', indexed=True),
+            ])
+            bucket.save_all({'id': i, 'name': f'name{i}', 'bio': 'x' * 200, 'views': 0} for i in range(rows))
+            keys = [random.randrange(rows) for _ in range(updates)]
+
+            def get_and_save():
+                for key in keys:
+                    item = bucket.get(key)
+                    item['views'] += 1
+                    bucket.save(item)
+
+            def increment():
+                for key in keys:
+                    bucket.increment(key, 'views')
+
+            def increment_all():
+                deltas = {}
+                for key in keys:
+                    deltas[key] = deltas.get(key, 0) + 1
+                bucket.increment_all('views', deltas)
+
+            measure('get and save', get_and_save, updates)
+            measure('increment', increment, updates)
+            measure('increment_all', increment_all, updates)
+            print(f'total views {sum(item["views"] for item in bucket.all())} (expected {3 * updates})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compares a plain bucket and a bucket partitioned by day for time range queries and retention.
+
+    python -m benchmarks.bench_partitions [rows] [days]
+"""
+import sys
+import tempfile
+import time
+from os import path
+
+from litedb import Repository, Field, where
+
+DAY = 86400
+SCHEMA = [Field('id', is_key=True), Field('ts', indexed=True), Field('payload')]
+
+
+def run(partitioned: bool, rows: int, days: int):
+    with tempfile.TemporaryDirectory() as temp:
+        with Repository(path.join(temp, 'bench.ldb'), profile='write_heavy') as repo:
+            options = {'partition_by': 'ts', 'partition_period': DAY} if partitioned else {}
+            bucket = repo.create_bucket('events', SCHEMA, **options)
+            step = days * DAY / rows
+            start = time.perf_counter()
+            for i in range(0, rows, 1000):
+                bucket.save_all({'id': j, 'ts': j * step, 'payload': 'x' * 100} for j in range(i, min(i + 1000, rows)))
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for day in range(days):
+                bucket.count(where('ts').between(day * DAY, day * DAY + 3600))
+            query_time = (time.perf_counter() - start) / days
+
+            # Retention of half of the days
+            before = days // 2 * DAY
+            start = time.perf_counter()
+            if partitioned:
+                bucket.drop_partitions(before)
+            else:
+                with repo._db_.transaction('events') as cur:
+                    cur.execute('delete from events where ts < :before', {'before': before})
+            retention_time = time.perf_counter() - start
+    name = 'partitioned' if partitioned else 'plain'
+    print(
+        f'{name:<12} writes {rows / write_time:>9.0f}/s   hour query {query_time * 1000:>7.2f}ms   '
+        f'retention {retention_time * 1000:>9.2f}ms'
+    )
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+    for partitioned in (False, True):
+        run(partitioned, rows, days)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""
+Compares the tuning profiles on a file repository.
+
+    python -m benchmarks.bench_profiles [rows]
+"""
+import random
+import sys
+import tempfile
+import time
+from os import path
+
+from litedb import Repository, Field, where
+from litedb.tuning import PROFILES
+
+
+def run(profile, rows: int):
+    with tempfile.TemporaryDirectory() as temp:
+        with Repository(path.join(temp, 'bench.ldb'), profile=profile) as repo:
+            bucket = repo.create_bucket('bench', [
+                Field('id', is_key=True),
+                Field('name'),
+                Field('age', indexed=True),
+            ])
+            start = time.perf_counter()
+            for i in range(0, rows, 100):
+                bucket.save_all({'id': j, 'name': f'name{j}', 'age': j % 100} for j in range(i, i + 100))
+            write_time = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for _ in range(rows // 10):
+                bucket.get(random.randrange(rows))
+            for age in range(100):
+                sum(1 for _ in bucket.filter(where('age').equal_to(age)))
+            read_time = time.perf_counter() - start
+    print(f'{profile or "default":<12} writes {rows / write_time:>10.0f}/s   reads {read_time:>7.3f}s')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    for profile in [None, *PROFILES.keys()]:
+        run(profile, rows)
+
+
+if __name__ == '__main__':
+    main()
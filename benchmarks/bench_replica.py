@@ -0,0 +1,45 @@
+"""
+Compares key lookups and range queries on a bucket and on its in-process replica.
+
+    python -m benchmarks.bench_replica [rows]
+"""
+import random
+import sys
+import time
+
+from litedb import Repository, Field, where
+
+
+def measure(name: str, lookup, queries: int, rounds: int = 5):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(queries):
+            lookup()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f'{name:<24} {best / queries * 1_000_000:>8.2f}us')
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with Repository() as repo:
+        bucket = repo.create_bucket('bench', [
+            Field('id', is_key=True),
+            Field('name'),
+            Field('age', indexed=True),
+        ])
+        bucket.save_all({'id': i, 'name': f'name{i}', 'age': i % 100} for i in range(rows))
+        replica = repo.replica('bench')
+        for name, reader in [('bucket', bucket), ('replica', replica)]:
+            measure(f'{name} get', lambda: reader.get(random.randrange(rows)), 20_000)
+            measure(f'{name} index', lambda: list(reader.filter(where('age').equal_to(random.randrange(100)))), 1000)
+            measure(
+                f'{name} index and scan',
+                lambda: list(reader.filter(where('age').between(10, 11) & where('name').starts_with('name1'))),
+                1000,
+            )
+
+
+if __name__ == '__main__':
+    main()
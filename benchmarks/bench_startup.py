@@ -0,0 +1,45 @@
+"""
+Measures the time to open a repository and use one bucket, by number of buckets.
+
+    python -m benchmarks.bench_startup [max_buckets]
+"""
+import sys
+import tempfile
+import time
+from os import path
+
+from litedb import Repository, Field
+
+SCHEMA = [Field('id', is_key=True), Field('name'), Field('age', indexed=True)] + [
+    Field(f'field{i}') for i in range(20)
+]
+
+
+def run(buckets: int, repeat: int = 20):
+    with tempfile.TemporaryDirectory() as temp:
+        file_path = path.join(temp, 'bench.ldb')
+        with Repository(file_path, profile='bulk_load') as repo:
+            for i in range(buckets):
+                repo.create_bucket(f'tenant{i}', SCHEMA)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            with Repository(file_path) as repo:
+                repo.bucket(f'tenant{buckets // 2}').get(1)
+        open_time = (time.perf_counter() - start) / repeat
+        with Repository(file_path) as repo:
+            start = time.perf_counter()
+            names = repo.buckets
+            list_time = time.perf_counter() - start
+    print(f'{buckets:>7} buckets  open {open_time * 1000:>8.2f}ms  list {list_time * 1000:>8.2f}ms ({len(names)})')
+
+
+def main():
+    max_buckets = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    buckets = 10
+    while buckets <= max_buckets:
+        run(buckets)
+        buckets *= 10
+
+
+if __name__ == '__main__':
+    main()
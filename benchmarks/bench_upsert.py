@@ -0,0 +1,63 @@
+"""
+Re-imports a snapshot where only a few rows changed, and reports the time and journal growth.
+
+    python -m benchmarks.bench_upsert [rows] [changed_percent]
+"""
+import os
+import sys
+import tempfile
+import time
+from os import path
+
+from litedb import Repository, Field
+
+BATCH_SIZE = 10_000
+
+
+def snapshot(rows: int, changed_every: int = 0):
+    for i in range(rows):
+        changed = changed_every and i % changed_every == 0
+        yield {'id': i, 'name': f'name{i}', 'email': f'user{i}@example.com', 'score': i % 1000 + (1 if changed else 0)}
+
+
+def save(bucket, items):
+    totals = [0, 0, 0]
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == BATCH_SIZE:
+            totals = [a + b for a, b in zip(totals, bucket.save_all(batch))]
+            batch = []
+    if batch:
+        totals = [a + b for a, b in zip(totals, bucket.save_all(batch))]
+    return totals
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    changed_percent = float(sys.argv[2]) if len(sys.argv) > 2 else 1
+    with tempfile.TemporaryDirectory() as temp:
+        file_path = path.join(temp, 'bench.ldb')
+        with Repository(file_path, profile='write_heavy') as repo:
+            bucket = repo.create_bucket('bench', [
+                Field('id', is_key=True),
+                Field('name'),
+                Field('email'),
+                Field('score', indexed=True),
+            ])
+            start = time.perf_counter()
+            inserted, _, _ = save(bucket, snapshot(rows))
+            print(f'import    {time.perf_counter() - start:>8.2f}s  inserted {inserted}')
+            repo._db_.conn.execute('pragma wal_checkpoint(truncate)')
+
+            start = time.perf_counter()
+            inserted, updated, unchanged = save(bucket, snapshot(rows, int(100 / changed_percent)))
+            wal_size = os.path.getsize(f'{file_path}-wal')
+            print(
+                f're-import {time.perf_counter() - start:>8.2f}s  inserted {inserted} updated {updated} '
+                f'unchanged {unchanged}  wal {wal_size / 2 ** 20:.1f}MB'
+            )
+
+
+if __name__ == '__main__':
+    main()
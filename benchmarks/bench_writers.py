@@ -0,0 +1,66 @@
+"""
+Measures write throughput with several processes writing to the same file.
+
+    python -m benchmarks.bench_writers [processes] [batches]
+"""
+import multiprocessing
+import sys
+import tempfile
+import time
+from os import path
+
+from litedb import Repository, Field
+
+BATCH_SIZE = 100
+
+
+def writer(file_path: str, worker: int, batches: int, results):
+    with Repository(file_path, profile='write_heavy', write_retries=100) as repo:
+        bucket = repo.bucket('events')
+        for batch in range(batches):
+            bucket.save_all(
+                {'id': f'{worker}-{batch}-{i}', 'worker': worker, 'value': i}
+                for i in range(BATCH_SIZE)
+            )
+        results.put(repo.lock_stats)
+
+
+def run(processes: int, batches: int):
+    with tempfile.TemporaryDirectory() as temp:
+        file_path = path.join(temp, 'bench.ldb')
+        with Repository(file_path, profile='write_heavy') as repo:
+            repo.create_bucket('events', [Field('id', is_key=True), Field('worker'), Field('value')])
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        workers = [
+            context.Process(target=writer, args=(file_path, worker, batches, results))
+            for worker in range(processes)
+        ]
+        start = time.perf_counter()
+        for process in workers:
+            process.start()
+        stats = [results.get() for _ in workers]
+        for process in workers:
+            process.join()
+        elapsed = time.perf_counter() - start
+        with Repository(file_path) as repo:
+            count = repo.bucket('events').count()
+    expected = processes * batches * BATCH_SIZE
+    print(
+        f'{processes:>2} writers  {count / elapsed:>10.0f} rows/s  '
+        f'lost {expected - count}  '
+        f'lock waits {sum(s.lock_waits for s in stats)} ({sum(s.lock_wait_ms for s in stats):.0f}ms)  '
+        f'retries {sum(s.retries for s in stats)}  failures {sum(s.failures for s in stats)}'
+    )
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    batches = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    for count in sorted({1, processes // 2, processes}):
+        if count > 0:
+            run(count, batches)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,20 @@
 from litedb.bucket import Bucket
 from litedb.erros import *
+from litedb.join import join
 from litedb.model import Field
-from litedb.query import where, asc, desc
+from litedb.query import where, asc, desc, add, maximum, minimum
 from litedb.repo import Repository
+
+
+def __getattr__(name: str):
+    # Optional components are only imported when used
+    if name == 'BufferedBucket':
+        from litedb.buffer import BufferedBucket
+        return BufferedBucket
+    if name == 'PartitionedBucket':
+        from litedb.partition import PartitionedBucket
+        return PartitionedBucket
+    if name == 'Replica':
+        from litedb.replica import Replica
+        return Replica
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
@@ -1,14 +1,27 @@
-from typing import Any, List, Dict, Iterable, Optional
+from typing import Any, List, Dict, Iterable, Optional, Tuple, TYPE_CHECKING
 
+from litedb.erros import BucketNotExpiring
 from litedb.model import Field
-from litedb.query import Sort, Query
-from litedb.storage import Table, DB
+from litedb.query import Sort, Query, add
+from litedb.storage import Table, DB, SaveResult, Changes, UpdateResult, sql_filter, sql_where
+
+if TYPE_CHECKING:
+    from litedb.cache import QueryCache
 
 
 class Bucket:
-    def __init__(self, db: DB, name: str, schema: List[Field]):
+    def __init__(
+            self,
+            db: DB,
+            name: str,
+            schema: List[Field],
+            cache: Optional['QueryCache'] = None,
+            ttl: Optional[float] = None,
+    ):
         self._db_ = db
-        self._table_ = Table(name, schema)
+        self._table_ = Table(name, schema, ttl)
+        # Results of expiring buckets change with time, not only with writes
+        self._cache_ = cache if ttl is None else None
 
     def __str__(self):
         return f'{self.__class__.__name__}({self.name}, {self.schema})'
@@ -24,38 +37,119 @@ class Bucket:
     def schema(self) -> List[Field]:
         return self._table_.schema
 
-    def save(self, item: Dict[str, Any], update_if_exists: bool = True):
-        if update_if_exists:
-            self._table_.upsert(self._db_, [item])
-        else:
-            self._table_.insert(self._db_, [item])
+    @property
+    def ttl(self) -> Optional[float]:
+        return self._table_.ttl
 
-    def save_all(self, items: Iterable[Dict[str, Any]], update_if_exists: bool = True):
+    @property
+    def partition_by(self) -> Optional[str]:
+        return None
+
+    def save(
+            self,
+            item: Dict[str, Any],
+            update_if_exists: bool = True,
+            ttl: Optional[float] = None,
+    ) -> Optional[SaveResult]:
+        return self.save_all([item], update_if_exists, ttl)
+
+    def save_all(
+            self,
+            items: Iterable[Dict[str, Any]],
+            update_if_exists: bool = True,
+            ttl: Optional[float] = None,
+    ) -> Optional[SaveResult]:
+        if ttl is not None and self.ttl is None:
+            raise BucketNotExpiring(self.name)
         if update_if_exists:
-            self._table_.upsert(self._db_, items)
-        else:
-            self._table_.insert(self._db_, items)
+            return self._table_.upsert(self._db_, items, ttl)
+        return self._table_.insert(self._db_, items, ttl)
+
+    def sweep(self, max_rows: int = 1000) -> int:
+        if self.ttl is None:
+            raise BucketNotExpiring(self.name)
+        return self._table_.sweep(self._db_, max_rows)
+
+    def flush(self):
+        # Writes go straight to the database, buffered buckets override this
+        pass
 
     def delete(self, key: Any):
         self._table_.delete(self._db_, key)
 
+    def update(self, key: Any, changes: Changes, returning: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Changes fields of the item with ``key`` in a single statement, with new values or
+        expressions of the current ones (``add``, ``maximum``, ``minimum``).
+        With ``returning``, gives the updated item, None when there is no such item.
+        """
+        rows = self._update_keys_([(key, changes)], returning)
+        if not returning or not rows:
+            return None
+        return self._table_.from_row(rows[0])
+
+    def update_all(self, query: Query, changes: Changes, returning: bool = False) -> UpdateResult:
+        result = self._update_query_(query, changes, returning)
+        if not returning:
+            return result
+        return [self._table_.from_row(row) for row in result]
+
+    def increment(self, key: Any, field: str, delta: Any = 1) -> Optional[Any]:
+        item = self.update(key, {field: add(delta)}, returning=True)
+        return item[field] if item is not None else None
+
+    def increment_all(self, field: str, deltas: Dict[Any, Any]) -> int:
+        # One transaction for every key
+        return self._update_keys_([(key, {field: add(delta)}) for key, delta in deltas.items()], False)
+
+    def _update_keys_(self, changes: List[Tuple[Any, Changes]], returning: bool) -> UpdateResult:
+        return self._table_.update_keys(self._db_, changes, returning)
+
+    def _update_query_(self, query: Query, changes: Changes, returning: bool) -> UpdateResult:
+        return self._table_.update_matches(self._db_, query, changes, returning)
+
     def __getitem__(self, key: Any) -> Optional[Dict[str, Any]]:
         return self.get(key)
 
-    def get(self, key: Any) -> Optional[Dict[str, Any]]:
-        return self._table_.find_by_key(self._db_, key)
+    def get(self, key: Any, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        return self._table_.find_by_key(self._db_, key, fields)
 
     def __iter__(self) -> Iterable[Dict[str, Any]]:
         return self.all()
 
-    def all(self) -> Iterable[Dict[str, Any]]:
-        return self._table_.fetch_all(self._db_)
-
-    def filter(self, query: Query, sort: Optional[Sort] = None) -> Iterable[Dict[str, Any]]:
-        return self._table_.fetch(self._db_, query, sort)
+    def all(self, fields: Optional[List[str]] = None) -> Iterable[Dict[str, Any]]:
+        return self._table_.fetch_all(self._db_, fields)
+
+    def filter(
+            self,
+            query: Query,
+            sort: Optional[Sort] = None,
+            fields: Optional[List[str]] = None,
+    ) -> Iterable[Dict[str, Any]]:
+        if self._cache_ is None:
+            return self._table_.fetch(self._db_, query, sort, fields)
+        # Statement and bound values, so equivalent queries share the entry
+        sql, params = sql_filter(self.name, self._table_.project(fields), query, sort)
+        items = self._cache_.fetch(
+            self._db_,
+            self.name,
+            ('filter', sql, tuple(params.values())),
+            lambda: list(self._table_.fetch(self._db_, query, sort, fields)),
+        )
+        # Copies keep callers from changing the cached items
+        return (dict(item) for item in items)
+
+    def explain(self, query: Query, sort: Optional[Sort] = None) -> List[str]:
+        return self._table_.explain(self._db_, query, sort)
 
     def __len__(self):
         return self.count()
 
-    def count(self) -> int:
-        return self._table_.count(self._db_)
+    def count(self, query: Optional[Query] = None) -> int:
+        if self._cache_ is None:
+            return self._table_.count(self._db_, query)
+        key = ('count',)
+        if query is not None:
+            where_clause, params = sql_where(query)
+            key = ('count', where_clause, tuple(params.values()))
+        return self._cache_.fetch(self._db_, self.name, key, lambda: self._table_.count(self._db_, query))
@@ -0,0 +1,208 @@
+import sqlite3
+import threading
+from typing import Any, List, Dict, Iterable, Optional, Tuple, TYPE_CHECKING
+
+from litedb.bucket import Bucket
+from litedb.erros import BufferIsClosed
+from litedb.model import Field
+from litedb.query import Sort, Query
+from litedb.storage import DB, SaveResult, Changes, UpdateResult
+
+if TYPE_CHECKING:
+    from litedb.cache import QueryCache
+
+# Marks a key whose last buffered operation was a delete
+_DELETED = object()
+
+
+class BufferedBucket(Bucket):
+    """
+    Write-behind bucket: saves and deletes are queued in memory, coalesced by key
+    (last write wins) and flushed by a background thread once ``max_items`` keys are
+    pending or every ``max_delay`` seconds, whichever comes first.
+    ``max_delay`` is the window of writes that can be lost if the process dies.
+    Buffers are closed with the repository and when their bucket changes or is dropped,
+    writes to a closed buffer raise ``BufferIsClosed``.
+    """
+
+    def __init__(
+            self,
+            db: DB,
+            name: str,
+            schema: List[Field],
+            cache: Optional['QueryCache'] = None,
+            ttl: Optional[float] = None,
+            max_items: int = 1000,
+            max_delay: float = 1.0,
+    ):
+        super().__init__(db, name, schema, cache, ttl)
+        self.max_items = max_items
+        self.max_delay = max_delay
+        self._pending_: Dict[Any, Any] = {}
+        self._flushing_: Dict[Any, Any] = {}
+        self._condition_ = threading.Condition()
+        self._flush_lock_ = threading.Lock()
+        self.last_error: Optional[Exception] = None
+        self._closed_ = False
+        self._thread_ = threading.Thread(target=self._run_, name=f'litedb-flush-{name}', daemon=True)
+        self._thread_.start()
+
+    def __repr__(self):
+        return f'<buffered bucket name={self.name}, schema={self.schema}>'
+
+    @property
+    def pending(self) -> int:
+        with self._condition_:
+            return len(self._pending_)
+
+    def save_all(
+            self,
+            items: Iterable[Dict[str, Any]],
+            update_if_exists: bool = True,
+            ttl: Optional[float] = None,
+    ) -> Optional[SaveResult]:
+        if not update_if_exists or ttl is not None:
+            # Inserts must fail on duplicated keys and the buffer only applies the bucket ttl,
+            # so these can't be deferred
+            self._check_open_()
+            self.flush()
+            return super().save_all(items, update_if_exists, ttl)
+        key = self._table_.key
+        changes = {}
+        for item in items:
+            # Checked now, a value SQLite can't store would fail the flush of every queued write
+            self._table_.check(item)
+            # Copied, so changes made by the caller after saving aren't written
+            changes[item[key]] = dict(item)
+        self._enqueue_(changes)
+        # Deferred writes are only counted by SQLite when flushed
+        return None
+
+    def delete(self, key: Any):
+        self._enqueue_({key: _DELETED})
+
+    def _update_keys_(self, changes: List[Tuple[Any, Changes]], returning: bool) -> UpdateResult:
+        # Expressions apply to the stored values, pending writes would overwrite the result
+        self._check_open_()
+        self.flush()
+        return super()._update_keys_(changes, returning)
+
+    def _update_query_(self, query: Query, changes: Changes, returning: bool) -> UpdateResult:
+        self._check_open_()
+        self.flush()
+        return super()._update_query_(query, changes, returning)
+
+    def get(self, key: Any, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        with self._condition_:
+            item = self._pending_.get(key, self._flushing_.get(key))
+        if item is None:
+            return super().get(key, fields)
+        if item is _DELETED:
+            return None
+        item = self._table_.template | item
+        if fields is None:
+            return item
+        return {field: item[field] for field in self._table_.project(fields)}
+
+    def all(self, fields: Optional[List[str]] = None) -> Iterable[Dict[str, Any]]:
+        self.flush()
+        return super().all(fields)
+
+    def filter(
+            self,
+            query: Query,
+            sort: Optional[Sort] = None,
+            fields: Optional[List[str]] = None,
+    ) -> Iterable[Dict[str, Any]]:
+        self.flush()
+        return super().filter(query, sort, fields)
+
+    def count(self, query: Optional[Query] = None) -> int:
+        self.flush()
+        return super().count(query)
+
+    def flush(self):
+        # Background flushes failing on the database keep their changes queued, so retrying surfaces the error
+        self._flush_()
+        self.last_error = None
+
+    def close(self):
+        with self._condition_:
+            if self._closed_:
+                return
+            self._closed_ = True
+            self._condition_.notify()
+        self._thread_.join()
+        self.flush()
+
+    def _check_open_(self):
+        # Closed with the repository or by a change of the bucket, nothing would flush the writes
+        if self._closed_:
+            raise BufferIsClosed(self.name)
+
+    def _enqueue_(self, changes: Dict[Any, Any]):
+        with self._condition_:
+            self._check_open_()
+            self._pending_.update(changes)
+            if len(self._pending_) >= self.max_items:
+                self._condition_.notify()
+
+    def _should_flush_(self) -> bool:
+        return self._closed_ or len(self._pending_) >= self.max_items
+
+    def _run_(self):
+        while True:
+            with self._condition_:
+                self._condition_.wait_for(self._should_flush_, timeout=self.max_delay)
+                if self._closed_:
+                    # Close flushes the rest, so its caller gets the errors
+                    return
+            try:
+                self._flush_()
+                self.last_error = None
+            except Exception as error:
+                self.last_error = error
+
+    def _flush_(self):
+        with self._flush_lock_:
+            with self._condition_:
+                if not self._pending_:
+                    return
+                self._flushing_, self._pending_ = self._pending_, {}
+            try:
+                self._write_(self._flushing_)
+            except sqlite3.OperationalError:
+                # Locked or failing database, the changes are written by a later flush
+                self._requeue_(self._flushing_)
+                raise
+            except Exception:
+                # Some change can't be stored, the others are still written
+                self._write_each_(self._flushing_)
+            finally:
+                with self._condition_:
+                    self._flushing_ = {}
+
+    def _write_(self, changes: Dict[Any, Any]):
+        items = [item for item in changes.values() if item is not _DELETED]
+        keys = [key for key, item in changes.items() if item is _DELETED]
+        self._table_.apply(self._db_, items, keys)
+
+    def _write_each_(self, changes: Dict[Any, Any]):
+        errors = []
+        keys = list(changes)
+        for index, key in enumerate(keys):
+            try:
+                self._write_({key: changes[key]})
+            except sqlite3.OperationalError:
+                self._requeue_({key: changes[key] for key in keys[index:]})
+                raise
+            except Exception as error:
+                # Dropped, it would fail every flush
+                errors.append(error)
+        if errors:
+            raise errors[0]
+
+    def _requeue_(self, changes: Dict[Any, Any]):
+        # Unless they were already superseded
+        with self._condition_:
+            self._pending_ = changes | self._pending_
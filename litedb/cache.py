@@ -0,0 +1,116 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, NamedTuple, Optional, Tuple
+
+from litedb.catalog import DB
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+    entries: int
+    size: int
+
+
+class CacheEntry(NamedTuple):
+    generation: int
+    value: Any
+    size: int
+
+
+class QueryCache:
+    """
+    LRU cache of query results, bounded by the approximate memory size of the cached values.
+    Entries are tagged with the write generation of their bucket, so any store or delete
+    made through this process invalidates them, and the whole cache is dropped when
+    ``pragma data_version`` reports a commit made by another connection.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries_: OrderedDict[Tuple[str, Hashable], CacheEntry] = OrderedDict()
+        self._data_version_: Optional[int] = None
+        self._lock_ = threading.RLock()
+
+    def __len__(self):
+        return len(self._entries_)
+
+    def stats(self) -> CacheStats:
+        with self._lock_:
+            return CacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                evictions=self.evictions,
+                invalidations=self.invalidations,
+                entries=len(self._entries_),
+                size=self.size,
+            )
+
+    def fetch(self, db: DB, bucket: str, key: Hashable, loader: Callable[[], Any]) -> Any:
+        with self._lock_:
+            self._check_data_version_(db)
+            generation = db.generation(bucket)
+            entry = self._entries_.get((bucket, key))
+            if entry is not None and entry.generation == generation:
+                self._entries_.move_to_end((bucket, key))
+                self.hits += 1
+                return entry.value
+            self.misses += 1
+        # Load outside the lock, a concurrent write just leaves the entry stale
+        value = loader()
+        size = estimate_size(value)
+        with self._lock_:
+            self._store_((bucket, key), CacheEntry(generation, value, size))
+        return value
+
+    def invalidate(self, bucket: Optional[str] = None):
+        with self._lock_:
+            keys = [
+                key
+                for key in self._entries_.keys()
+                if bucket is None or key[0] == bucket
+            ]
+            for key in keys:
+                self._remove_(key)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def _check_data_version_(self, db: DB):
+        data_version = db.data_version()
+        if self._data_version_ is not None and self._data_version_ != data_version:
+            self.invalidate()
+        self._data_version_ = data_version
+
+    def _store_(self, key: Tuple[str, Hashable], entry: CacheEntry):
+        self._remove_(key)
+        if entry.size > self.max_size:
+            return
+        self._entries_[key] = entry
+        self.size += entry.size
+        while self.size > self.max_size:
+            oldest = next(iter(self._entries_))
+            self._remove_(oldest)
+            self.evictions += 1
+
+    def _remove_(self, key: Tuple[str, Hashable]):
+        entry = self._entries_.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+
+def estimate_size(value: Any) -> int:
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(map(estimate_size, value))
+    if isinstance(value, Dict):
+        return sys.getsizeof(value) + sum(map(sys.getsizeof, value.values()))
+    return sys.getsizeof(value)
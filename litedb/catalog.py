@@ -1,95 +1,346 @@
 import json
+import random
 import sqlite3
-from typing import Dict, List, Tuple, Callable, Any, Iterable
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Callable, Any, Iterable, Iterator, Optional, NamedTuple, TypeVar
 
-from litedb.erros import InvalidSchemaChange
+from litedb.erros import InvalidSchemaChange, InvalidPartition
 from litedb.model import Field
 
+# Hidden column with the time (in seconds since the epoch) items of expiring buckets expire
+EXPIRES_AT = 'litedb_expires_at'
+# Taking the write lock slower than this (in seconds) counts as a lock wait
+LOCK_WAIT_THRESHOLD = 0.001
+# Upper bound (in seconds) of the sleep between retries of a locked write
+MAX_RETRY_BACKOFF = 1.0
+
+T = TypeVar('T')
+# Stored rows and deleted keys of a committed write
+Changes = Tuple[List[Dict[str, Any]], List[Any]]
+Listener = Callable[[List[Dict[str, Any]], List[Any]], None]
+
+
+class LockStats(NamedTuple):
+    transactions: int
+    lock_waits: int
+    lock_wait_ms: float
+    retries: int
+    failures: int
+
 
 class DB:
-    def __init__(self, file_name: str):
-        self.conn = sqlite3.connect(file_name)
+    def __init__(
+            self,
+            file_name: str,
+            pragmas: Optional[Dict[str, Any]] = None,
+            busy_timeout: float = 5.0,
+            write_retries: int = 5,
+            retry_backoff: float = 0.01,
+    ):
+        # SQLite itself waits up to busy_timeout seconds for a lock held by another process
+        self.conn = sqlite3.connect(file_name, timeout=busy_timeout, check_same_thread=False)
+        self.write_retries = write_retries
+        self.retry_backoff = retry_backoff
+        self.transactions = 0
+        self.lock_waits = 0
+        self.lock_wait_time = 0.0
+        self.retries = 0
+        self.failures = 0
+        # Serializes writers sharing the connection (e.g. background flushes)
+        self.lock = threading.RLock()
+        # Write generation per bucket, bumped on every store, delete and schema change
+        self.generations: Dict[str, int] = {}
+        # Notified of the changes of each bucket once they are committed (e.g. by replicas)
+        self.listeners: Dict[str, List[Listener]] = {}
+        self._retry_(lambda: self._setup_(pragmas or {}))
+
+    def _setup_(self, pragmas: Dict[str, Any]):
+        # Must run before the catalog is created, page_size can't change afterwards
+        for name, value in pragmas.items():
+            self.conn.execute(f'pragma {name}={value}')
         with self.conn:
             self.conn.execute(
                 """
                 create table if not exists litedb_catalog (
                 bucket_name text primary key,
-                schema text not null)
+                schema text not null,
+                migration text,
+                options text)
                 """
             )
+            # Catalogs created by older versions
+            catalog_columns = self.columns('litedb_catalog')
+            for column in ('migration', 'options'):
+                if column not in catalog_columns:
+                    self.conn.execute(f'alter table litedb_catalog add column {column} text')
+
+    @contextmanager
+    def transaction(self, name: str) -> Iterator[sqlite3.Cursor]:
+        with self.lock:
+            try:
+                self._begin_()
+                with self.conn:
+                    yield self.conn.cursor()
+            finally:
+                self._bump_(name)
+
+    def write(self, name: str, operation: Callable[[sqlite3.Cursor], T], changes: Optional[Changes] = None) -> T:
+        """
+        Runs operation in a write transaction, retrying it with jittered exponential backoff
+        when the database is still locked by another process after the busy timeout.
+        The operation may run more than once, so it must not consume its input.
+        Listeners of the bucket get ``changes`` after the commit, still holding the lock,
+        so they see the writes in commit order.
+        """
+        def run() -> T:
+            with self.lock:
+                with self.transaction(name) as cur:
+                    result = operation(cur)
+                if changes is not None:
+                    self.notify(name, *changes)
+                return result
+
+        return self._retry_(run)
+
+    def listen(self, name: str, listener: Listener):
+        self.listeners.setdefault(name, []).append(listener)
+
+    def unlisten(self, name: str, listener: Listener):
+        listeners = self.listeners.get(name, [])
+        if listener in listeners:
+            listeners.remove(listener)
+        if not listeners:
+            self.listeners.pop(name, None)
+
+    def notify(self, name: str, rows: List[Dict[str, Any]], keys: List[Any]):
+        for listener in self.listeners.get(name, []):
+            listener(rows, keys)
+
+    def _retry_(self, operation: Callable[[], T]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return operation()
+            except sqlite3.OperationalError as error:
+                if not is_busy(error):
+                    raise
+                # Only writes that never got the lock count as failures
+                if attempt >= self.write_retries:
+                    self.failures += 1
+                    raise
+            attempt += 1
+            self.retries += 1
+            time.sleep(random.uniform(0, min(self.retry_backoff * 2 ** attempt, MAX_RETRY_BACKOFF)))
 
-    def catalog(self) -> Dict[str, List[Field]]:
-        cur = self.conn.execute('select bucket_name, schema from litedb_catalog')
+    def lock_stats(self) -> LockStats:
+        return LockStats(
+            transactions=self.transactions,
+            lock_waits=self.lock_waits,
+            lock_wait_ms=self.lock_wait_time * 1000,
+            retries=self.retries,
+            failures=self.failures,
+        )
+
+    def _begin_(self):
+        if self.conn.in_transaction:
+            return
+        # Take the write lock up front, a deferred transaction can't wait for it once it has read
+        start = time.perf_counter()
+        self.conn.execute('begin immediate')
+        waited = time.perf_counter() - start
+        self.transactions += 1
+        if waited > LOCK_WAIT_THRESHOLD:
+            self.lock_waits += 1
+            self.lock_wait_time += waited
+
+    def generation(self, name: str) -> int:
+        return self.generations.get(name, 0)
+
+    def data_version(self) -> int:
+        cur = self.conn.execute('pragma data_version')
+        return cur.fetchone()[0]
+
+    def columns(self, name: str) -> List[str]:
+        cur = self.conn.execute(f'pragma table_info({name})')
+        return [row[1] for row in cur.fetchall()]
+
+    def migration(self, name: str) -> Optional[Dict[str, Any]]:
+        cur = self.conn.execute('select migration from litedb_catalog where bucket_name=:name', {'name': name})
+        row = cur.fetchone()
+        return json.loads(row[0]) if row is not None and row[0] is not None else None
+
+    def expire(self, name: str, ttl: Optional[float]):
+        def expire():
+            with self.transaction(name) as cur:
+                cur.execute(
+                    'update litedb_catalog set options=:options where bucket_name=:name',
+                    {'name': name, 'options': encode_options({'ttl': ttl})},
+                )
+                if ttl is not None and EXPIRES_AT not in self.columns(name):
+                    cur.execute(f'alter table {name} add column {EXPIRES_AT}')
+                    cur.execute(sql_create_index(name, EXPIRES_AT))
+                elif ttl is None and EXPIRES_AT in self.columns(name):
+                    # Expired items not swept yet would be visible again, and the others would expire
+                    # at their old time if the ttl came back, saves without a ttl don't change it
+                    cur.execute(f'delete from {name} where {EXPIRES_AT} <= :now', {'now': time.time()})
+                    cur.execute(f'update {name} set {EXPIRES_AT}=null where {EXPIRES_AT} is not null')
+
+        self._retry_(expire)
+
+    def expiring(self) -> List[str]:
+        cur = self.conn.execute(
+            "select bucket_name from litedb_catalog where json_extract(options, '$.ttl') is not null"
+        )
+        return [row[0] for row in cur.fetchall()]
+
+    def settings(self, names: Iterable[str]) -> Dict[str, Any]:
         return {
-            bucket: decode_schema(schema)
-            for bucket, schema in cur.fetchall()
+            name: self.conn.execute(f'pragma {name}').fetchone()[0]
+            for name in names
         }
 
-    def _schema_(self, name: str) -> List[Field]:
-        cur = self.conn.execute('select schema from litedb_catalog where bucket_name=:name', {'name': name})
+    def _bump_(self, name: str):
+        self.generations[name] = self.generations.get(name, 0) + 1
+
+    def partition(self, name: str, options: Dict[str, Any]):
+        def partition():
+            with self.transaction(name) as cur:
+                cur.execute(
+                    'update litedb_catalog set options=:options where bucket_name=:name',
+                    {'name': name, 'options': encode_options({'partition': options})},
+                )
+
+        self._retry_(partition)
+
+    def partitioned(self) -> List[Tuple[str, Dict[str, Any]]]:
+        cur = self.conn.execute(
+            "select bucket_name, json_extract(options, '$.partition') from litedb_catalog "
+            "where json_extract(options, '$.partition') is not null"
+        )
+        return [(row[0], json.loads(row[1])) for row in cur.fetchall()]
+
+    def partitions(self, name: str) -> List[Tuple[str, float]]:
+        cur = self.conn.execute(
+            "select bucket_name, json_extract(options, '$.start') from litedb_catalog "
+            "where json_extract(options, '$.parent')=:name order by 2",
+            {'name': name},
+        )
+        return [(row[0], row[1]) for row in cur.fetchall()]
+
+    def parent(self, name: str) -> Optional[str]:
+        cur = self.conn.execute(
+            "select json_extract(options, '$.parent') from litedb_catalog where bucket_name=:name",
+            {'name': name},
+        )
         row = cur.fetchone()
-        return decode_schema(row[0]) if row is not None else []
+        return row[0] if row is not None else None
 
-    def create(self, name: str, schema: List[Field]):
-        with self.conn:
-            cur = self.conn.cursor()
-            # Add entry to catalog
-            catalog_entry = {
-                'name': name,
-                'schema': encode_schema(schema),
-            }
-            cur.execute('insert into litedb_catalog (bucket_name, schema) values (:name, :schema)', catalog_entry)
-            # Create table
-            cur.execute(sql_create_table(name, schema))
-            # Create indexes
-            for field in schema:
-                if field.indexed:
-                    cur.execute(sql_create_index(name, field.name))
-
-    def alter(self, name: str, new_schema: List[Field]):
-        old_schema = self._schema_(name)
-        # Check key not changed
-        old_key = get_key(old_schema)
-        new_key = get_key(new_schema)
-        if old_key != new_key:
-            raise InvalidSchemaChange("Schema key can't be changed")
-        # Update catalog
-        with self.conn:
-            cur = self.conn.cursor()
-            # Add entry to catalog
-            catalog_entry = {
-                'name': name,
-                'schema': encode_schema(new_schema),
-            }
-            cur.execute('update litedb_catalog set schema = :schema where bucket_name = :name', catalog_entry)
-            # Diff schema
-            old_indices = filter(lambda x: x.indexed, old_schema)
-            new_indices = filter(lambda x: x.indexed, new_schema)
-            deleted_indices, added_indices = diff(old_indices, new_indices, lambda x: x.name)
-            deleted_columns, added_columns = diff(old_schema, new_schema, lambda x: x.name)
-            # Drop indices
-            for column in deleted_indices:
-                cur.execute(sql_drop_index(name, column))
-            # Drop columns
-            for column in deleted_columns:
-                cur.execute(sql_drop_column(name, column))
-            # Add columns
-            for column in added_columns:
-                cur.execute(sql_add_column(name, column))
-            # Create new indices
-            for column in added_indices:
-                cur.execute(sql_create_index(name, column))
+    def names(self) -> List[str]:
+        # Partitions belong to their bucket
+        cur = self.conn.execute(
+            "select bucket_name from litedb_catalog where json_extract(options, '$.parent') is null"
+        )
+        return [row[0] for row in cur.fetchall()]
+
+    def entry(self, name: str) -> Optional[Tuple[List[Field], Dict[str, Any]]]:
+        # Partitions are only reached through their bucket
+        cur = self.conn.execute(
+            "select schema, options from litedb_catalog "
+            "where bucket_name=:name and json_extract(options, '$.parent') is null",
+            {'name': name},
+        )
+        row = cur.fetchone()
+        if row is None:
+            return None
+        schema, options = row
+        return decode_schema(schema), decode_options(options)
+
+    def create(
+            self,
+            name: str,
+            schema: List[Field],
+            ttl: Optional[float] = None,
+            partition: Optional[Dict[str, Any]] = None,
+    ):
+        def create():
+            with self.transaction(name) as cur:
+                # Add entry to catalog
+                catalog_entry = {
+                    'name': name,
+                    'schema': encode_schema(schema),
+                    'options': encode_options({'ttl': ttl, 'partition': partition}),
+                }
+                cur.execute(
+                    'insert into litedb_catalog (bucket_name, schema, options) values (:name, :schema, :options)',
+                    catalog_entry,
+                )
+                # Partitioned buckets only have the tables of their partitions
+                if partition is not None:
+                    return
+                # Create table
+                cur.execute(sql_create_table(name, schema, ttl is not None))
+                # Create indexes
+                for field in schema:
+                    if field.indexed:
+                        cur.execute(sql_create_index(name, field.name))
+                if ttl is not None:
+                    cur.execute(sql_create_index(name, EXPIRES_AT))
+
+        self._retry_(create)
+
+    def create_partition(self, parent: str, name: str, schema: List[Field], start: float):
+        def create():
+            with self.transaction(parent) as cur:
+                cur.execute(
+                    'insert or ignore into litedb_catalog (bucket_name, schema, options) '
+                    'values (:name, :schema, :options)',
+                    {'name': name, 'schema': encode_schema(schema), 'options': encode_options({
+                        'parent': parent,
+                        'start': start,
+                    })},
+                )
+                if cur.rowcount == 0:
+                    # Created meanwhile by another process, unless the name is taken by a bucket
+                    if self.parent(name) != parent:
+                        raise InvalidPartition(f'Partition {name} of bucket {parent} clashes with bucket {name}')
+                    return
+                cur.execute(sql_create_table(name, schema))
+                for field in schema:
+                    if field.indexed:
+                        cur.execute(sql_create_index(name, field.name))
+
+        self._retry_(create)
+
+    def drop_partition(self, parent: str, name: str):
+        def drop():
+            with self.transaction(parent) as cur:
+                cur.execute('delete from litedb_catalog where bucket_name=:name', {'name': name})
+                cur.execute(f'drop table if exists {name}')
+
+        self._retry_(drop)
 
     def drop(self, name: str):
-        with self.conn:
-            cur = self.conn.cursor()
-            cur.execute('delete from litedb_catalog where bucket_name=:name', {'name': name})
-            cur.execute(f'drop table {name}')
+        def drop():
+            with self.transaction(name) as cur:
+                for partition, _ in self.partitions(name):
+                    cur.execute('delete from litedb_catalog where bucket_name=:name', {'name': partition})
+                    cur.execute(f'drop table {partition}')
+                cur.execute('delete from litedb_catalog where bucket_name=:name', {'name': name})
+                cur.execute(f'drop table if exists {name}')
+
+        self._retry_(drop)
 
     def close(self):
         self.conn.close()
 
 
+def is_busy(error: sqlite3.OperationalError) -> bool:
+    message = str(error)
+    return 'database is locked' in message or 'database is busy' in message
+
+
 def decode_schema(schema: str) -> List[Field]:
     return [
         Field.from_dict(field_dict)
@@ -105,24 +356,53 @@ def encode_schema(schema: List[Field]) -> str:
     return json.dumps(dict_list)
 
 
-def sql_create_table(table: str, schema: List[Field]) -> str:
+def encode_options(options: Dict[str, Any]) -> Optional[str]:
+    options = {name: value for name, value in options.items() if value is not None}
+    return json.dumps(options) if options else None
+
+
+def decode_options(options: Optional[str]) -> Dict[str, Any]:
+    return json.loads(options) if options is not None else {}
+
+
+def sql_create_table(table: str, schema: List[Field], expiring: bool = False) -> str:
     columns = [
-        f'{field.name} primary key' if field.is_key else field.name
+        sql_column(field)
         for field in schema
     ]
+    if expiring:
+        columns.append(EXPIRES_AT)
     return f'create table {table} ({",".join(columns)})'
 
 
-def sql_add_column(table: str, column: str) -> str:
-    return f'alter table {table} add column {column}'
+def sql_column(field: Field) -> str:
+    if field.is_key:
+        return f'{field.name} primary key'
+    if field.default is not None:
+        return f'{field.name} default {sql_literal(field.default)}'
+    return field.name
+
+
+def sql_literal(value: Any) -> str:
+    # Defaults are part of the DDL and can't be bound as parameters
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, str):
+        escaped = value.replace("'", "''")
+        return f"'{escaped}'"
+    raise InvalidSchemaChange(f'Unsupported default value {value!r}')
 
 
-def sql_drop_column(table: str, column: str) -> str:
-    return f'alter table {table} drop column {column}'
+def sql_add_column(table: str, field: Field) -> str:
+    return f'alter table {table} add column {sql_column(field)}'
 
 
 def sql_create_index(table: str, column: str) -> str:
-    return f'create index idx_{table}_{column} on {table} ({column})'
+    return f'create index if not exists idx_{table}_{column} on {table} ({column})'
 
 
 def sql_drop_index(table: str, column: str) -> str:
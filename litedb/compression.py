@@ -0,0 +1,57 @@
+from typing import Any, Callable, Dict, Tuple
+
+# Values of compressed fields stored as blobs start with a tag byte: raw bytes, or the codec and
+# whether the original value was bytes or text. Smaller texts are stored as plain text
+RAW = 0
+CODECS = ('zlib', 'lzma')
+
+
+def compress(value: Any, codec: str, threshold: int) -> Any:
+    if isinstance(value, str):
+        if len(value) < threshold:
+            return value
+        data, is_text = value.encode('utf-8'), True
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        data, is_text = bytes(value), False
+    else:
+        return value
+    if len(data) >= threshold:
+        compressor, _ = codec_functions(codec)
+        compressed = compressor(data)
+        # Incompressible values are kept as they are
+        if len(compressed) < len(data):
+            return bytes([codec_tag(codec, is_text)]) + compressed
+    if is_text:
+        return value
+    return bytes([RAW]) + data
+
+
+def decompress(value: Any) -> Any:
+    if not isinstance(value, bytes) or not value:
+        return value
+    tag = value[0]
+    if tag == RAW:
+        return value[1:]
+    codec, is_text = CODECS[(tag - 1) // 2], (tag - 1) % 2 == 1
+    _, decompressor = codec_functions(codec)
+    data = decompressor(value[1:])
+    return data.decode('utf-8') if is_text else data
+
+
+def codec_tag(codec: str, is_text: bool) -> int:
+    return 1 + CODECS.index(codec) * 2 + int(is_text)
+
+
+def codec_functions(codec: str) -> Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]:
+    if codec not in _codecs_:
+        # Codecs are only imported when a bucket uses them
+        if codec == 'zlib':
+            import zlib
+            _codecs_[codec] = (zlib.compress, zlib.decompress)
+        else:
+            import lzma
+            _codecs_[codec] = (lzma.compress, lzma.decompress)
+    return _codecs_[codec]
+
+
+_codecs_: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {}
@@ -37,3 +37,49 @@ class RepositoryIsClosed(LiteDBError):
             if repository_name is not None
             else 'In memory repository is closed'
         )
+
+
+class InvalidTuning(LiteDBError):
+    def __init__(self, msg: str):
+        self.message = msg
+        super().__init__(self.message)
+
+
+class BucketNotExpiring(LiteDBError):
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self.message = f'Bucket {bucket_name} has no ttl'
+        super().__init__(self.message)
+
+
+class InvalidJoin(LiteDBError):
+    def __init__(self, msg: str):
+        self.message = msg
+        super().__init__(self.message)
+
+
+class InvalidField(LiteDBError):
+    def __init__(self, field_name: str, msg: str):
+        self.field_name = field_name
+        self.message = f'Field {field_name} {msg}'
+        super().__init__(self.message)
+
+
+class ReplicaIsClosed(LiteDBError):
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self.message = f'Replica of bucket {bucket_name} is closed'
+        super().__init__(self.message)
+
+
+class BufferIsClosed(LiteDBError):
+    def __init__(self, bucket_name: str):
+        self.bucket_name = bucket_name
+        self.message = f'Buffer of bucket {bucket_name} is closed'
+        super().__init__(self.message)
+
+
+class InvalidPartition(LiteDBError):
+    def __init__(self, msg: str):
+        self.message = msg
+        super().__init__(self.message)
@@ -0,0 +1,130 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from litedb.bucket import Bucket
+from litedb.erros import InvalidJoin
+from litedb.query import Query, Sort
+from litedb.storage import iterate, sql_condition, sql_live
+
+
+class Join:
+    """
+    Join of two buckets of the same repository, executed by SQLite as a single statement.
+    Fields in ``sort`` are qualified by the bucket alias (e.g. ``asc('users.name')``).
+    Rows are nested by alias (``{'orders': {...}, 'users': {...}}``) or, when ``nested``
+    is false, flattened with prefixed field names (``{'orders.id': ..., 'users.id': ...}``).
+    """
+
+    def __init__(
+            self,
+            left: Bucket,
+            right: Bucket,
+            on: Tuple[str, str],
+            left_query: Optional[Query] = None,
+            right_query: Optional[Query] = None,
+            sort: Optional[Sort] = None,
+            outer: bool = False,
+            nested: bool = True,
+            aliases: Optional[Tuple[str, str]] = None,
+    ):
+        if left._db_ is not right._db_:
+            raise InvalidJoin('Only buckets of the same repository can be joined')
+        if left.partition_by is not None or right.partition_by is not None:
+            raise InvalidJoin("Partitioned buckets can't be joined")
+        for bucket, query in ((left, left_query), (right, right_query)):
+            if query is not None:
+                bucket._table_.check_query(query)
+        self.left = left
+        self.right = right
+        self.on = on
+        self.left_query = left_query
+        self.right_query = right_query
+        self.sort = sort
+        self.outer = outer
+        self.nested = nested
+        self.aliases = aliases if aliases is not None else (left.name, right.name)
+        if self.aliases[0] == self.aliases[1]:
+            raise InvalidJoin('Joined buckets need different aliases')
+
+    def __iter__(self) -> Iterable[Dict[str, Any]]:
+        return self.rows()
+
+    def rows(self) -> Iterable[Dict[str, Any]]:
+        self.left.flush()
+        self.right.flush()
+        sql, params = self.sql()
+        cur = self.left._db_.conn.cursor()
+        cur.execute(sql, params)
+        return iterate(cur, self._to_row_)
+
+    def explain(self) -> List[str]:
+        sql, params = self.sql()
+        cur = self.left._db_.conn.cursor()
+        cur.execute(f'explain query plan {sql}', params)
+        return [row[3] for row in cur.fetchall()]
+
+    def sql(self) -> Tuple[str, Dict[str, Any]]:
+        left_alias, right_alias = self.aliases
+        left_table, right_table = self.left._table_, self.right._table_
+        params = {}
+        columns = [
+            f'{alias}.{field}'
+            for alias, table in zip(self.aliases, (left_table, right_table))
+            for field in table.fields
+        ]
+        # Conditions on the right bucket go in the join clause, so outer joins keep unmatched rows
+        join_conditions = [f'{left_alias}.{self.on[0]} = {right_alias}.{self.on[1]}']
+        where_conditions = []
+        if self.right_query is not None:
+            join_conditions.append(sql_condition(self.right_query, params, f'{right_alias}.'))
+        if right_table.live is not None:
+            join_conditions.append(sql_live(f'{right_alias}.'))
+        if self.left_query is not None:
+            where_conditions.append(sql_condition(self.left_query, params, f'{left_alias}.'))
+        if left_table.live is not None:
+            where_conditions.append(sql_live(f'{left_alias}.'))
+        if left_table.live is not None or right_table.live is not None:
+            params['now'] = time.time()
+        join_type = 'left join' if self.outer else 'join'
+        sql = (
+            f'select {",".join(columns)} from {left_table.name} as {left_alias} '
+            f'{join_type} {right_table.name} as {right_alias} on {" and ".join(join_conditions)}'
+        )
+        if where_conditions:
+            sql = f'{sql} where {" and ".join(where_conditions)}'
+        if self.sort is not None:
+            sql = f'{sql} order by {str(self.sort)}'
+        return sql, params
+
+    def _to_row_(self, values: Tuple) -> Dict[str, Any]:
+        left_alias, right_alias = self.aliases
+        left_table, right_table = self.left._table_, self.right._table_
+        left_values, right_values = values[:len(left_table.fields)], values[len(left_table.fields):]
+        left_item, right_item = left_table.to_item(left_values), right_table.to_item(right_values)
+        if not self.nested:
+            return {
+                f'{alias}.{field}': value
+                for alias, item in zip(self.aliases, (left_item, right_item))
+                for field, value in item.items()
+            }
+        # Unmatched rows of outer joins
+        if self.outer and all(value is None for value in right_values):
+            right_item = None
+        return {
+            left_alias: left_item,
+            right_alias: right_item,
+        }
+
+
+def join(
+        left: Bucket,
+        right: Bucket,
+        on: Tuple[str, str],
+        left_query: Optional[Query] = None,
+        right_query: Optional[Query] = None,
+        sort: Optional[Sort] = None,
+        outer: bool = False,
+        nested: bool = True,
+        aliases: Optional[Tuple[str, str]] = None,
+) -> Join:
+    return Join(left, right, on, left_query, right_query, sort, outer, nested, aliases)
@@ -0,0 +1,166 @@
+import threading
+import time
+from typing import List, NamedTuple, Optional
+
+from litedb.catalog import DB
+from litedb.storage import sql_sweep
+
+
+class MaintenanceStep(NamedTuple):
+    name: str
+    duration_ms: float
+    detail: str
+
+
+class Maintenance:
+    """
+    Keeps a long-running repository healthy: deletes expired items of expiring buckets
+    in batches of ``sweep_rows``, drops the partitions past the retention of partitioned
+    buckets, refreshes the planner statistics after
+    ``analyze_after`` changed rows, returns free pages to the file in slices of
+    ``vacuum_pages`` (needs ``auto_vacuum=incremental``) and checkpoints the WAL,
+    truncating it once it grows past ``truncate_pages``.
+    Runs on explicit ``run(budget_ms)`` calls or every ``interval`` seconds on a thread.
+    """
+
+    def __init__(
+            self,
+            db: DB,
+            sweep_rows: int = 1000,
+            analyze_after: int = 10_000,
+            vacuum_pages: int = 128,
+            truncate_pages: int = 10_000,
+    ):
+        self.db = db
+        self.sweep_rows = sweep_rows
+        self.analyze_after = analyze_after
+        self.vacuum_pages = vacuum_pages
+        self.truncate_pages = truncate_pages
+        self.last_report: List[MaintenanceStep] = []
+        self._analyzed_changes_ = 0
+        self._stop_ = threading.Event()
+        self._thread_: Optional[threading.Thread] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread_ is not None
+
+    def run(self, budget_ms: float = 50) -> List[MaintenanceStep]:
+        deadline = time.perf_counter() + budget_ms / 1000
+        steps = [
+            self._expire_,
+            self._retain_,
+            self._analyze_,
+            self._vacuum_,
+            self._checkpoint_,
+        ]
+        report = []
+        for step in steps:
+            if time.perf_counter() >= deadline:
+                break
+            start = time.perf_counter()
+            with self.db.lock:
+                detail = step(deadline)
+            if detail is not None:
+                report.append(MaintenanceStep(step.__name__.strip('_'), (time.perf_counter() - start) * 1000, detail))
+        self.last_report = report
+        return report
+
+    def start(self, interval: float, budget_ms: float = 50):
+        if self._thread_ is not None:
+            return
+        self._stop_.clear()
+        self._thread_ = threading.Thread(
+            target=self._run_,
+            args=(interval, budget_ms),
+            name='litedb-maintenance',
+            daemon=True,
+        )
+        self._thread_.start()
+
+    def stop(self):
+        if self._thread_ is None:
+            return
+        self._stop_.set()
+        self._thread_.join()
+        self._thread_ = None
+
+    def _run_(self, interval: float, budget_ms: float):
+        while not self._stop_.wait(interval):
+            try:
+                self.run(budget_ms)
+            except Exception:
+                # Maintenance is best effort, the next round will try again
+                pass
+
+    def _expire_(self, deadline: float) -> Optional[str]:
+        deleted = 0
+        for name in self.db.expiring():
+            while time.perf_counter() < deadline:
+                params = {'now': time.time(), 'limit': self.sweep_rows}
+                rows = self.db.write(name, lambda cur: cur.execute(sql_sweep(name), params).rowcount)
+                deleted += rows
+                if rows < self.sweep_rows:
+                    break
+        if deleted == 0:
+            return None
+        return f'deleted {deleted} expired items'
+
+    def _retain_(self, deadline: float) -> Optional[str]:
+        dropped = 0
+        now = time.time()
+        for name, partition in self.db.partitioned():
+            if partition.get('retention') is None:
+                continue
+            for partition_name, start in self.db.partitions(name):
+                if start + partition['period'] > now - partition['retention'] or time.perf_counter() >= deadline:
+                    break
+                self.db.drop_partition(name, partition_name)
+                dropped += 1
+        if dropped == 0:
+            return None
+        return f'dropped {dropped} partitions'
+
+    def _analyze_(self, deadline: float) -> Optional[str]:
+        changes = self.db.conn.total_changes
+        if changes - self._analyzed_changes_ < self.analyze_after:
+            return None
+        self._analyzed_changes_ = changes
+        cur = self.db.conn.cursor()
+        has_stats = cur.execute(
+            "select count(*) from sqlite_master where name='sqlite_stat1'"
+        ).fetchone()[0]
+        if has_stats:
+            cur.execute('pragma optimize')
+            return 'optimize'
+        # First run, sample the indexes so it stays cheap on large tables
+        cur.execute('pragma analysis_limit=1000')
+        cur.execute('analyze')
+        return 'analyze'
+
+    def _vacuum_(self, deadline: float) -> Optional[str]:
+        cur = self.db.conn.cursor()
+        if cur.execute('pragma auto_vacuum').fetchone()[0] != 2:
+            return None
+        free_pages = cur.execute('pragma freelist_count').fetchone()[0]
+        released = 0
+        while free_pages > 0 and time.perf_counter() < deadline:
+            cur.execute(f'pragma incremental_vacuum({self.vacuum_pages})').fetchall()
+            new_free_pages = cur.execute('pragma freelist_count').fetchone()[0]
+            released += free_pages - new_free_pages
+            free_pages = new_free_pages
+        if released == 0:
+            return None
+        return f'released {released} pages, {free_pages} free pages left'
+
+    def _checkpoint_(self, deadline: float) -> Optional[str]:
+        cur = self.db.conn.cursor()
+        if cur.execute('pragma journal_mode').fetchone()[0] != 'wal':
+            return None
+        busy, log_pages, checkpointed = cur.execute('pragma wal_checkpoint(passive)').fetchone()
+        if log_pages <= 0:
+            return None
+        if log_pages >= self.truncate_pages and log_pages == checkpointed:
+            busy, _, checkpointed = cur.execute('pragma wal_checkpoint(truncate)').fetchone()
+            return f'truncated wal of {log_pages} pages' if not busy else f'checkpointed {checkpointed} of {log_pages} pages'
+        return f'checkpointed {checkpointed} of {log_pages} pages'
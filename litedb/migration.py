@@ -0,0 +1,243 @@
+import json
+import sqlite3
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from litedb.catalog import (DB, encode_schema, decode_schema, get_key, diff, sql_add_column, sql_create_index,
+                            sql_drop_index)
+from litedb.compression import compress, decompress
+from litedb.erros import InvalidSchemaChange
+from litedb.model import Field
+from litedb.storage import Table
+
+Backfill = Callable[[Dict[str, Any]], Any]
+
+
+class MigrationProgress(NamedTuple):
+    bucket: str
+    step: str
+    done: int
+    total: int
+    eta: Optional[float]
+
+
+class Migration:
+    """
+    Changes the schema of a bucket without holding the repository for the whole change.
+    Columns are added and indexes dropped in a first short transaction, then rows are
+    backfilled and dropped columns cleared in batches of ``batch_size`` rows, each batch
+    in its own transaction, and new indexes are only built after the backfill.
+    Progress is recorded in ``litedb_catalog``, so a crashed migration resumes where it stopped.
+    Dropped columns are removed from the bucket schema and cleared, but not from the table,
+    which would rewrite it in a single transaction. Columns whose compression changes are
+    rewritten in batches as well.
+    """
+
+    def __init__(
+            self,
+            db: DB,
+            name: str,
+            backfill: Optional[Dict[str, Backfill]] = None,
+            batch_size: int = 1000,
+            progress: Optional[Callable[[MigrationProgress], None]] = None,
+    ):
+        self.db = db
+        self.name = name
+        self.backfill = backfill or {}
+        self.batch_size = batch_size
+        self.progress = progress
+
+    def start(self, old_schema: List[Field], new_schema: List[Field]):
+        if get_key(old_schema) != get_key(new_schema):
+            raise InvalidSchemaChange("Schema key can't be changed")
+        new_fields = {field.name: field for field in new_schema}
+        old_fields = {field.name: field for field in old_schema}
+        old_indices = filter(lambda x: x.indexed, old_schema)
+        new_indices = filter(lambda x: x.indexed, new_schema)
+        deleted_indices, added_indices = diff(old_indices, new_indices, lambda x: x.name)
+        deleted_columns, added_columns = diff(old_schema, new_schema, lambda x: x.name)
+        existing_columns = self.db.columns(self.name)
+        steps = []
+        for column in added_columns:
+            if column in self.backfill:
+                steps.append({'op': 'backfill', 'column': column})
+            elif column in existing_columns and new_fields[column].default is not None:
+                # Left behind by an earlier drop, so it doesn't get the default by itself
+                steps.append({'op': 'fill', 'column': column})
+        for column in deleted_columns:
+            steps.append({'op': 'clear', 'column': column})
+        for column in new_fields.keys() & old_fields.keys():
+            old, new = old_fields[column], new_fields[column]
+            if compression(old) != compression(new):
+                steps.append({'op': 'recode', 'column': column, 'compressed': old.compression is not None})
+        for column in added_indices:
+            steps.append({'op': 'index', 'column': column})
+        state = {
+            'schema': encode_schema(new_schema),
+            'steps': steps,
+            'step': 0,
+            'rowid': 0,
+        }
+
+        def prepare(cur: sqlite3.Cursor):
+            self._save_(cur, state)
+            for column in deleted_indices:
+                cur.execute(sql_drop_index(self.name, column))
+            for column in added_columns:
+                if column not in existing_columns:
+                    cur.execute(sql_add_column(self.name, new_fields[column]))
+
+        self.db.write(self.name, prepare)
+        self.resume(state)
+
+    def resume(self, state: Dict[str, Any]):
+        schema = decode_schema(state['schema'])
+        fields = {field.name: field for field in schema}
+        for column in [step['column'] for step in state['steps'][state['step']:] if step['op'] == 'backfill']:
+            if column not in self.backfill:
+                raise InvalidSchemaChange(f'Migration of {self.name} needs the backfill of {column} to resume')
+        while state['step'] < len(state['steps']):
+            step = state['steps'][state['step']]
+            column = step['column']
+            if step['op'] == 'index':
+                self._next_step_(state, lambda cur: cur.execute(sql_create_index(self.name, column)))
+                self._report_(f'index {column}', 1, 1, time.perf_counter())
+            elif step['op'] == 'backfill':
+                self._backfill_(state, schema, column)
+            elif step['op'] == 'recode':
+                self._recode_(state, fields[column], step['compressed'])
+            else:
+                value = encode(fields[column], fields[column].default) if step['op'] == 'fill' else None
+                self._set_(state, step['op'], column, value)
+        self.db.write(self.name, lambda cur: cur.execute(
+            'update litedb_catalog set schema=:schema, migration=null where bucket_name=:name',
+            {'name': self.name, 'schema': state['schema']},
+        ))
+
+    def _backfill_(self, state: Dict[str, Any], schema: List[Field], column: str):
+        function = self.backfill[column]
+        table = Table(self.name, schema)
+        fields = [field.name for field in schema if field.name != column]
+        field = next(field for field in schema if field.name == column)
+        self._rewrite_(
+            state,
+            f'backfill {column}',
+            fields,
+            column,
+            lambda values: encode(field, function(table.to_item(values, fields))),
+        )
+
+    def _recode_(self, state: Dict[str, Any], field: Field, compressed: bool):
+        # Values stored before the field was compressed are plain, not tagged
+        self._rewrite_(
+            state,
+            f'recode {field.name}',
+            [field.name],
+            field.name,
+            lambda values: encode(field, decompress(values[0]) if compressed else values[0]),
+        )
+
+    def _rewrite_(
+            self,
+            state: Dict[str, Any],
+            step: str,
+            fields: List[str],
+            column: str,
+            function: Callable[[Tuple], Any],
+    ):
+        select = (
+            f'select rowid, {",".join(fields)} from {self.name} '
+            f'where rowid > :rowid order by rowid limit :limit'
+        )
+        update = f'update {self.name} set {column}=:value where rowid=:rowid'
+        total = self._count_(state)
+        done = 0
+        start = time.perf_counter()
+
+        def batch(cur: sqlite3.Cursor) -> List[Tuple]:
+            # Read in the write transaction, so no commit lands between reading and rewriting a row
+            rows = cur.execute(select, {'rowid': state['rowid'], 'limit': self.batch_size}).fetchall()
+            if rows:
+                changes = [
+                    {'rowid': row[0], 'value': function(row[1:])}
+                    for row in rows
+                ]
+                cur.executemany(update, changes)
+                self._save_(cur, state | {'rowid': rows[-1][0]})
+            return rows
+
+        while True:
+            rows = self.db.write(self.name, batch)
+            if not rows:
+                break
+            # Only once committed, a retried batch starts from the same row
+            state['rowid'] = rows[-1][0]
+            done += len(rows)
+            self._report_(step, done, total, start)
+        self._next_step_(state)
+
+    def _set_(self, state: Dict[str, Any], op: str, column: str, value: Any):
+        # Batches are rowid ranges, so each one is an index range update
+        upper_bound = (
+            f'select max(rowid) from (select rowid from {self.name} '
+            f'where rowid > :rowid order by rowid limit :limit)'
+        )
+        update = f'update {self.name} set {column}=:value where rowid > :lower and rowid <= :upper'
+        total = self._count_(state)
+        done = 0
+        start = time.perf_counter()
+        while True:
+            cur = self.db.conn.execute(upper_bound, {'rowid': state['rowid'], 'limit': self.batch_size})
+            upper = cur.fetchone()[0]
+            if upper is None:
+                break
+
+            def batch(cur: sqlite3.Cursor) -> int:
+                cur.execute(update, {'value': value, 'lower': state['rowid'], 'upper': upper})
+                self._save_(cur, state | {'rowid': upper})
+                return cur.rowcount
+
+            done += self.db.write(self.name, batch)
+            state['rowid'] = upper
+            self._report_(f'{op} {column}', done, total, start)
+        self._next_step_(state)
+
+    def _count_(self, state: Dict[str, Any]) -> int:
+        cur = self.db.conn.execute(f'select count(*) from {self.name} where rowid > :rowid', {'rowid': state['rowid']})
+        return cur.fetchone()[0]
+
+    def _next_step_(self, state: Dict[str, Any], operation: Optional[Callable[[sqlite3.Cursor], Any]] = None):
+        next_state = state | {'step': state['step'] + 1, 'rowid': 0}
+
+        def save(cur: sqlite3.Cursor):
+            if operation is not None:
+                operation(cur)
+            self._save_(cur, next_state)
+
+        self.db.write(self.name, save)
+        state.update(next_state)
+
+    def _save_(self, cur, state: Dict[str, Any]):
+        cur.execute(
+            'update litedb_catalog set migration=:migration where bucket_name=:name',
+            {'name': self.name, 'migration': json.dumps(state)},
+        )
+
+    def _report_(self, step: str, done: int, total: int, start: float):
+        if self.progress is None:
+            return
+        elapsed = time.perf_counter() - start
+        eta = elapsed / done * max(total - done, 0) if done > 0 else None
+        self.progress(MigrationProgress(self.name, step, done, total, eta))
+
+
+def compression(field: Field) -> Optional[Tuple[str, int]]:
+    if field.compression is None:
+        return None
+    return field.compression, field.compression_threshold
+
+
+def encode(field: Field, value: Any) -> Any:
+    if field.compression is None:
+        return value
+    return compress(value, field.compression, field.compression_threshold)
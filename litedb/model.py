@@ -1,17 +1,37 @@
-from typing import Dict
+from typing import Dict, Any, Optional
+
+# Smallest value, in bytes, compressed by default
+COMPRESSION_THRESHOLD = 256
 
 
 class Field:
-    def __init__(self, name: str, is_key: bool = False, indexed: bool = False):
+    def __init__(
+            self,
+            name: str,
+            is_key: bool = False,
+            indexed: bool = False,
+            default: Any = None,
+            compression: Optional[str] = None,
+            compression_threshold: int = COMPRESSION_THRESHOLD,
+    ):
         self.name = name
         self.is_key = is_key
         self.indexed = indexed
+        self.default = default
+        self.compression = compression
+        self.compression_threshold = compression_threshold
 
     def __str__(self):
-        return f'{self.__class__.__name__}({self.name}, {self.is_key}, {self.indexed})'
+        return (
+            f'{self.__class__.__name__}({self.name}, {self.is_key}, {self.indexed}, {self.default}, '
+            f'{self.compression}, {self.compression_threshold})'
+        )
 
     def __repr__(self):
-        return f"{self.__class__.__name__}('{self.name}', {self.is_key}, {self.indexed})"
+        return (
+            f"{self.__class__.__name__}('{self.name}', {self.is_key}, {self.indexed}, {self.default!r}, "
+            f"{self.compression!r}, {self.compression_threshold})"
+        )
 
     def __eq__(self, other) -> bool:
         if not isinstance(other, Field):
@@ -22,6 +42,12 @@ class Field:
             return False
         if self.indexed != other.indexed:
             return False
+        if self.default != other.default:
+            return False
+        if self.compression != other.compression:
+            return False
+        if self.compression is not None and self.compression_threshold != other.compression_threshold:
+            return False
         return True
 
     def to_dict(self):
@@ -29,6 +55,9 @@ class Field:
             'name': self.name,
             'is_key': self.is_key,
             'indexed': self.indexed,
+            'default': self.default,
+            'compression': self.compression,
+            'compression_threshold': self.compression_threshold,
         }
 
     @classmethod
@@ -37,4 +66,7 @@ class Field:
             name=props['name'],
             is_key=props.get('is_key', False),
             indexed=props.get('indexed', False),
+            default=props.get('default'),
+            compression=props.get('compression'),
+            compression_threshold=props.get('compression_threshold', COMPRESSION_THRESHOLD),
         )
@@ -0,0 +1,302 @@
+import math
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from litedb.bucket import Bucket
+from litedb.erros import BucketNotExpiring, InvalidPartition
+from litedb.model import Field
+from litedb.query import Query, QueryOperator, ComposedCondition, NegatedCondition, Sort, SortOrder
+from litedb.storage import Table, DB, SaveResult, Changes, UpdateResult, iterate, sql_condition
+
+# Inclusive bounds of the times a query can match, None when unbounded
+TimeRange = Tuple[Optional[float], Optional[float]]
+
+EVERY_TIME: TimeRange = (None, None)
+
+
+class PartitionedBucket(Bucket):
+    """
+    Bucket split by the time in ``partition_by`` (seconds since the epoch) into one table
+    for every ``period`` seconds. Partitions are registered in ``litedb_catalog`` under the
+    bucket and are not listed as buckets.
+    Queries only read the partitions that their conditions on the time field can match.
+    Old items are removed by dropping whole partitions, either with ``drop_partitions`` or
+    through ``maintain`` for buckets with a ``retention`` (in seconds).
+    Items saved again with another time move to the partition of their new time.
+    """
+
+    def __init__(
+            self,
+            db: DB,
+            name: str,
+            schema: List[Field],
+            partition_by: str,
+            period: float,
+            retention: Optional[float] = None,
+    ):
+        # Not cached, results are assembled from several tables
+        super().__init__(db, name, schema)
+        self._partition_by_ = partition_by
+        self.period = period
+        self.retention = retention
+        self._tables_: Dict[str, Table] = {}
+        self._known_: List[Tuple[str, float]] = []
+        self._known_version_: Optional[Tuple[int, int]] = None
+
+    def __repr__(self):
+        return f'<partitioned bucket name={self.name}, schema={self.schema}, partition_by={self.partition_by}>'
+
+    @property
+    def partition_by(self) -> Optional[str]:
+        return self._partition_by_
+
+    @property
+    def partitions(self) -> List[str]:
+        return [name for name, _ in self._catalog_()]
+
+    def save_all(
+            self,
+            items: Iterable[Dict[str, Any]],
+            update_if_exists: bool = True,
+            ttl: Optional[float] = None,
+    ) -> Optional[SaveResult]:
+        if ttl is not None:
+            raise BucketNotExpiring(self.name)
+        key = self._table_.key
+        rows = list(self._table_._rows_(items, None))
+        # An item saved again with another time ends up in the partition of its last save
+        periods = {row[key]: self._period_(row) for row in rows}
+        groups: Dict[int, List[Dict[str, Any]]] = {}
+        for row in rows:
+            groups.setdefault(periods[row[key]], []).append(row)
+        existing = set(self.partitions)
+        partitions = []
+        for period, rows in sorted(groups.items()):
+            table = self._partition_(partition_name(self.name, period))
+            if table.name not in existing:
+                self._db_.create_partition(self.name, table.name, self.schema, period * self.period)
+            partitions.append((table, rows))
+        tables = self._partitions_()
+
+        def store(cur: sqlite3.Cursor) -> SaveResult:
+            results = [SaveResult(0, 0, 0)]
+            for table, rows in partitions:
+                keys = list({row[key] for row in rows})
+                others = [other for other in tables if other.name != table.name]
+                if update_if_exists:
+                    inserted, updated, unchanged = table.store(cur, rows)
+                    # Keys are unique in the bucket, items whose time changed move to their new partition.
+                    # Only keys new to this partition can be in another one
+                    moved = sum(other.delete_keys(cur, keys) for other in others) if inserted else 0
+                    results.append(SaveResult(inserted - moved, updated + moved, unchanged))
+                    continue
+                if any(other._count_keys_(cur, keys) for other in others):
+                    raise sqlite3.IntegrityError(f'UNIQUE constraint failed: {self.name}.{key}')
+                cur.executemany(table.sql.insert, rows)
+                results.append(SaveResult(len(rows), 0, 0))
+            return SaveResult(*map(sum, zip(*results)))
+
+        # All partitions in one transaction, under the name of the bucket
+        return self._db_.write(self.name, store)
+
+    def delete(self, key: Any):
+        tables = self._partitions_()
+
+        def delete(cur: sqlite3.Cursor):
+            for table in tables:
+                cur.execute(table.sql.delete, {'key': key})
+
+        self._db_.write(self.name, delete)
+
+    def _update_keys_(self, changes: List[Tuple[Any, Changes]], returning: bool) -> UpdateResult:
+        for _, item_changes in changes:
+            self._check_changes_(item_changes)
+        return self._update_(self._partitions_(), lambda table, cur: table.modify_keys(cur, changes, returning), returning)
+
+    def _update_query_(self, query: Query, changes: Changes, returning: bool) -> UpdateResult:
+        self._check_changes_(changes)
+        tables = self._partitions_(query)
+        return self._update_(tables, lambda table, cur: table.modify_matches(cur, query, changes, returning), returning)
+
+    def _update_(
+            self,
+            tables: List[Table],
+            operation: Callable[[Table, sqlite3.Cursor], UpdateResult],
+            returning: bool,
+    ) -> UpdateResult:
+        def update(cur: sqlite3.Cursor) -> UpdateResult:
+            results = [operation(table, cur) for table in tables]
+            if returning:
+                # Newer partitions first, like get
+                return [row for rows in reversed(results) for row in rows]
+            return sum(results)
+
+        return self._db_.write(self.name, update)
+
+    def _check_changes_(self, changes: Changes):
+        if self.partition_by in changes:
+            raise InvalidPartition(f"{self.partition_by} of {self.name} picks the partition of items and can't be updated")
+
+    def get(self, key: Any, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        # The key says nothing of the time, newer partitions first
+        for table in reversed(self._partitions_()):
+            item = table.find_by_key(self._db_, key, fields)
+            if item is not None:
+                return item
+        return None
+
+    def all(self, fields: Optional[List[str]] = None) -> Iterable[Dict[str, Any]]:
+        tables = self._partitions_()
+        return (item for table in tables for item in table.fetch_all(self._db_, fields))
+
+    def filter(
+            self,
+            query: Query,
+            sort: Optional[Sort] = None,
+            fields: Optional[List[str]] = None,
+    ) -> Iterable[Dict[str, Any]]:
+        tables = self._partitions_(query)
+        if sort is None:
+            # Partition after partition, in time order
+            return (item for table in tables for item in table.fetch(self._db_, query, None, fields))
+        if not tables:
+            return iter([])
+        columns = self._table_.project(fields)
+        sql, params = self._sql_(tables, query, sort, columns)
+        cur = self._db_.conn.execute(sql, params)
+        return iterate(cur, lambda values: self._table_.to_item(values[:len(columns)], columns))
+
+    def explain(self, query: Query, sort: Optional[Sort] = None) -> List[str]:
+        tables = self._partitions_(query)
+        if not tables:
+            return []
+        sql, params = self._sql_(tables, query, sort, self._table_.fields)
+        cur = self._db_.conn.execute(f'explain query plan {sql}', params)
+        return [row[3] for row in cur.fetchall()]
+
+    def count(self, query: Optional[Query] = None) -> int:
+        return sum(table.count(self._db_, query) for table in self._partitions_(query))
+
+    def drop_partitions(self, before: float) -> int:
+        dropped = 0
+        for name, start in self._catalog_():
+            if start + self.period > before:
+                break
+            self._db_.drop_partition(self.name, name)
+            self._tables_.pop(name, None)
+            dropped += 1
+        return dropped
+
+    def _period_(self, row: Dict[str, Any]) -> int:
+        time = row[self.partition_by]
+        if not isinstance(time, (int, float)):
+            raise InvalidPartition(f'Items of {self.name} need a time in {self.partition_by}, got {time!r}')
+        return math.floor(time / self.period)
+
+    def _partition_(self, name: str) -> Table:
+        if name not in self._tables_:
+            self._tables_[name] = Table(name, self.schema)
+        return self._tables_[name]
+
+    def _partitions_(self, query: Optional[Query] = None) -> List[Table]:
+        if query is not None:
+            self._table_.check_query(query)
+        time_ranges = [EVERY_TIME] if query is None else query_time_ranges(query, self.partition_by)
+        if not time_ranges:
+            return []
+        return [
+            self._partition_(name)
+            for name, start in self._catalog_()
+            if any(overlaps(time_range, start, start + self.period) for time_range in time_ranges)
+        ]
+
+    def _catalog_(self) -> List[Tuple[str, float]]:
+        # Partitions change with writes to the bucket or commits of other connections
+        version = (self._db_.data_version(), self._db_.generation(self.name))
+        if version != self._known_version_:
+            self._known_ = self._db_.partitions(self.name)
+            self._known_version_ = version
+        return self._known_
+
+    def _sql_(
+            self,
+            tables: List[Table],
+            query: Query,
+            sort: Optional[Sort],
+            columns: List[str],
+    ) -> Tuple[str, Dict[str, Any]]:
+        # Sort fields must be selected to order a compound select
+        sort_fields = [] if sort is None else [
+            order.field_name
+            for order in (sort.sort_order if isinstance(sort, SortOrder) else [sort])
+            if order.field_name not in columns
+        ]
+        columns_str = ','.join(columns + sort_fields)
+        params = {}
+        sql = ' union all '.join(
+            f'select {columns_str} from {table.name} where {sql_condition(query, params)}'
+            for table in tables
+        )
+        if sort is not None:
+            sql = f'{sql} order by {str(sort)}'
+        return sql, params
+
+
+def partition_name(name: str, period: int) -> str:
+    return f'{name}__p{period}' if period >= 0 else f'{name}__n{-period}'
+
+
+def query_time_ranges(query: Query, field: str) -> List[TimeRange]:
+    # Conservative, every time the query could match, no ranges when it can't match any
+    if isinstance(query, ComposedCondition):
+        left, right = query_time_ranges(query.left, field), query_time_ranges(query.right, field)
+        if query.operator == QueryOperator.OR:
+            return left + right
+        return [
+            time_range
+            for time_range in (intersect(left_range, right_range) for left_range in left for right_range in right)
+            if time_range is not None
+        ]
+    if isinstance(query, NegatedCondition) or query.field_name != field:
+        return [EVERY_TIME]
+    operator, target = query.operator, query.target
+    if operator == QueryOperator.IS_NULL:
+        # Every item has a time
+        return []
+    if operator == QueryOperator.BETWEEN:
+        low, high = target
+        if not is_time(low) or not is_time(high):
+            return [EVERY_TIME]
+        return [] if low > high else [(low, high)]
+    if operator == QueryOperator.ANY:
+        times = [value for value in target if is_time(value)]
+        if len(times) != len([value for value in target if value is not None]):
+            return [EVERY_TIME]
+        return [(value, value) for value in times]
+    if not is_time(target):
+        return [EVERY_TIME]
+    if operator == QueryOperator.EQ:
+        return [(target, target)]
+    if operator in (QueryOperator.LT, QueryOperator.LE):
+        return [(None, target)]
+    if operator in (QueryOperator.GT, QueryOperator.GE):
+        return [(target, None)]
+    return [EVERY_TIME]
+
+
+def intersect(left: TimeRange, right: TimeRange) -> Optional[TimeRange]:
+    lows = [low for low in (left[0], right[0]) if low is not None]
+    highs = [high for high in (left[1], right[1]) if high is not None]
+    low, high = max(lows, default=None), min(highs, default=None)
+    if low is not None and high is not None and low > high:
+        return None
+    return low, high
+
+
+def overlaps(time_range: TimeRange, start: float, end: float) -> bool:
+    low, high = time_range
+    return (low is None or end > low) and (high is None or start <= high)
+
+
+def is_time(value: Any) -> bool:
+    return isinstance(value, (int, float))
@@ -12,6 +12,17 @@ class QueryOperator(Enum):
     GT = '>'
     GE = '>='
     ANY = 'in'
+    BETWEEN = 'between'
+    PREFIX = 'starts with'
+    IS_NULL = 'is null'
+    NOT_NULL = 'is not null'
+    NOT = 'not'
+
+
+class UpdateOperator(Enum):
+    ADD = 'add'
+    MAX = 'maximum'
+    MIN = 'minimum'
 
 
 class QuerySort(Enum):
@@ -26,6 +37,9 @@ class Query:
     def __or__(self, other: 'Query') -> 'Query':
         return ComposedCondition(self, QueryOperator.OR, other)
 
+    def __invert__(self) -> 'Query':
+        return NegatedCondition(self)
+
 
 class ComposedCondition(Query):
     def __init__(self, left: Query, operator: QueryOperator, right: Query):
@@ -37,6 +51,15 @@ class ComposedCondition(Query):
         return f'({str(self.left)} {self.operator.value} {str(self.right)})'
 
 
+class NegatedCondition(Query):
+    def __init__(self, query: Query):
+        self.operator = QueryOperator.NOT
+        self.query = query
+
+    def __str__(self):
+        return f'({self.operator.value} {str(self.query)})'
+
+
 class Condition(Query):
     def __init__(self, field_name: str):
         self.field_name = field_name
@@ -44,6 +67,11 @@ class Condition(Query):
         self.target = None
 
     def __str__(self):
+        if self.operator in (QueryOperator.IS_NULL, QueryOperator.NOT_NULL):
+            return f'({self.field_name} {self.operator.value})'
+        if self.operator == QueryOperator.BETWEEN:
+            low, high = self.target
+            return f'({self.field_name} {self.operator.value} {_str_target_(low)} and {_str_target_(high)})'
         return f'({self.field_name} {self.operator.value} {_str_target_(self.target)})'
 
     def equal_to(self, target: Any) -> Query:
@@ -81,6 +109,26 @@ class Condition(Query):
         self.target = target
         return self
 
+    def between(self, low: Any, high: Any) -> Query:
+        self.operator = QueryOperator.BETWEEN
+        self.target = (low, high)
+        return self
+
+    def starts_with(self, prefix: str) -> Query:
+        self.operator = QueryOperator.PREFIX
+        self.target = prefix
+        return self
+
+    def is_null(self) -> Query:
+        self.operator = QueryOperator.IS_NULL
+        self.target = None
+        return self
+
+    def is_not_null(self) -> Query:
+        self.operator = QueryOperator.NOT_NULL
+        self.target = None
+        return self
+
 
 def where(field_name: str) -> Condition:
     return Condition(field_name)
@@ -117,6 +165,32 @@ def desc(field_name: str) -> Sort:
     return OrderBy(field_name, QuerySort.DESC)
 
 
+class Expression:
+    """
+    New value of a field computed by SQLite from its current value, see ``add``, ``maximum``
+    and ``minimum``. A NULL field counts as 0 when added to, and as the value for the others.
+    """
+
+    def __init__(self, operator: UpdateOperator, value: Any):
+        self.operator = operator
+        self.value = value
+
+    def __str__(self):
+        return f'{self.operator.value}({_str_target_(self.value)})'
+
+
+def add(value: Any) -> Expression:
+    return Expression(UpdateOperator.ADD, value)
+
+
+def maximum(value: Any) -> Expression:
+    return Expression(UpdateOperator.MAX, value)
+
+
+def minimum(value: Any) -> Expression:
+    return Expression(UpdateOperator.MIN, value)
+
+
 def _str_target_(value) -> str:
     if isinstance(value, List):
         str_values = map(_str_target_, value)
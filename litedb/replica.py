@@ -0,0 +1,395 @@
+import threading
+import time
+from bisect import bisect_left, insort
+from operator import eq, ne, lt, le, gt, ge
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from litedb.bucket import Bucket
+from litedb.catalog import EXPIRES_AT
+from litedb.erros import ReplicaIsClosed
+from litedb.model import Field
+from litedb.query import Query, QueryOperator, QuerySort, ComposedCondition, NegatedCondition, Sort, SortOrder
+from litedb.storage import prefix_upper_bound, sql_find_all
+
+# Sorts after every slot of the index entries of a value
+_LAST = float('inf')
+
+Predicate = Callable[[int], Optional[bool]]
+
+
+class Replica:
+    """
+    Read-only copy of a bucket kept in the process, for small buckets read far more often than
+    they change. Items are stored in column lists, with a hash index on the key and sorted
+    indexes on the indexed fields, and queries are evaluated on them with the semantics of
+    SQLite (NULL comparisons and the ordering of values of different types).
+    Writes made through the repository are applied as they are committed. Commits of other
+    connections are noticed through ``pragma data_version``, checked at most every
+    ``refresh_interval`` seconds, and reload the whole replica.
+    """
+
+    def __init__(self, bucket: Bucket, refresh_interval: float = 1.0):
+        self._db_ = bucket._db_
+        self._table_ = bucket._table_
+        self.refresh_interval = refresh_interval
+        self._lock_ = threading.RLock()
+        self._closed_ = False
+        self._columns_: Dict[str, List[Any]] = {}
+        self._slots_: Dict[Any, int] = {}
+        self._free_: List[int] = []
+        self._indexes_: Dict[str, List[Tuple]] = {}
+        self._data_version_: Optional[int] = None
+        self._checked_at_ = 0.0
+        # Holding the write lock, so no commit falls between the load and the first notification
+        with self._db_.lock:
+            self.reload()
+            self._db_.listen(self.name, self._apply_)
+
+    def __repr__(self):
+        return f'<replica name={self.name}, schema={self.schema}>'
+
+    @property
+    def name(self) -> str:
+        return self._table_.name
+
+    @property
+    def schema(self) -> List[Field]:
+        return self._table_.schema
+
+    def reload(self):
+        # Always the database lock first, writers notify holding it
+        with self._db_.lock, self._lock_:
+            self._data_version_ = self._db_.data_version()
+            self._checked_at_ = time.monotonic()
+            columns = self._table_.columns
+            cur = self._db_.conn.execute(sql_find_all(self.name, columns))
+            rows = cur.fetchall()
+            self._columns_ = {
+                column: [row[i] for row in rows]
+                for i, column in enumerate(columns)
+            }
+            key = self._columns_[self._table_.key]
+            self._slots_ = {value: slot for slot, value in enumerate(key)}
+            self._free_ = []
+            self._indexes_ = {
+                field.name: sorted(
+                    sort_key(value) + (slot,)
+                    for slot, value in enumerate(self._columns_[field.name])
+                )
+                for field in self.schema
+                if field.indexed
+            }
+
+    def close(self):
+        with self._db_.lock, self._lock_:
+            if self._closed_:
+                return
+            self._db_.unlisten(self.name, self._apply_)
+            self._closed_ = True
+            self._columns_, self._slots_, self._free_, self._indexes_ = {}, {}, [], {}
+
+    def __getitem__(self, key: Any) -> Optional[Dict[str, Any]]:
+        return self.get(key)
+
+    def get(self, key: Any, fields: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+        self._check_()
+        with self._lock_:
+            slot = self._slots_.get(key)
+            if slot is None or not self._live_(slot, time.time()):
+                return None
+            columns = self._table_.project(fields)
+            values = tuple(self._columns_[column][slot] for column in columns)
+            return self._table_.to_item(values, columns)
+
+    def __iter__(self) -> Iterable[Dict[str, Any]]:
+        return self.all()
+
+    def all(self, fields: Optional[List[str]] = None) -> Iterable[Dict[str, Any]]:
+        self._check_()
+        with self._lock_:
+            now = time.time()
+            slots = sorted(slot for slot in self._slots_.values() if self._live_(slot, now))
+            return self._items_(slots, self._table_.project(fields))
+
+    def filter(
+            self,
+            query: Query,
+            sort: Optional[Sort] = None,
+            fields: Optional[List[str]] = None,
+    ) -> Iterable[Dict[str, Any]]:
+        self._check_()
+        # Indexes and predicates hold the stored values
+        self._table_.check_query(query)
+        with self._lock_:
+            now = time.time()
+            slots = self._lookup_(query)
+            if slots is None:
+                slots = self._matches_(query, self._slots_.values())
+            if EXPIRES_AT in self._columns_:
+                slots = [slot for slot in slots if self._live_(slot, now)]
+            slots = sorted(slots)
+            if sort is not None:
+                self._sort_(slots, sort)
+            return self._items_(slots, self._table_.project(fields))
+
+    def __len__(self):
+        return self.count()
+
+    def count(self) -> int:
+        self._check_()
+        with self._lock_:
+            if EXPIRES_AT not in self._columns_:
+                return len(self._slots_)
+            now = time.time()
+            return sum(1 for slot in self._slots_.values() if self._live_(slot, now))
+
+    def _check_(self):
+        if self._closed_:
+            raise ReplicaIsClosed(self.name)
+        if time.monotonic() - self._checked_at_ < self.refresh_interval:
+            return
+        # Only commits of other connections change the data version
+        if self._db_.data_version() != self._data_version_:
+            self.reload()
+        else:
+            self._checked_at_ = time.monotonic()
+
+    def _apply_(self, rows: List[Dict[str, Any]], keys: List[Any]):
+        with self._lock_:
+            for row in rows:
+                self._store_(row)
+            for key in keys:
+                self._remove_(key)
+
+    def _store_(self, row: Dict[str, Any]):
+        key = stored(row[self._table_.key])
+        slot = self._slots_.get(key)
+        if slot is not None:
+            self._unindex_(slot)
+            for column, values in self._columns_.items():
+                values[slot] = stored(row[column])
+        elif self._free_:
+            slot = self._free_.pop()
+            self._slots_[key] = slot
+            for column, values in self._columns_.items():
+                values[slot] = stored(row[column])
+        else:
+            slot = len(self._columns_[self._table_.key])
+            self._slots_[key] = slot
+            for column, values in self._columns_.items():
+                values.append(stored(row[column]))
+        for field, index in self._indexes_.items():
+            insort(index, sort_key(self._columns_[field][slot]) + (slot,))
+
+    def _remove_(self, key: Any):
+        slot = self._slots_.pop(stored(key), None)
+        if slot is None:
+            return
+        self._unindex_(slot)
+        for values in self._columns_.values():
+            values[slot] = None
+        self._free_.append(slot)
+
+    def _unindex_(self, slot: int):
+        for field, index in self._indexes_.items():
+            del index[bisect_left(index, sort_key(self._columns_[field][slot]) + (slot,))]
+
+    def _live_(self, slot: int, now: float) -> bool:
+        expires = self._columns_.get(EXPIRES_AT)
+        return expires is None or expires[slot] is None or expires[slot] > now
+
+    def _items_(self, slots: List[int], columns: List[str]) -> List[Dict[str, Any]]:
+        # Gathered a column at a time, then zipped into rows
+        values = zip(*(list(map(self._columns_[column].__getitem__, slots)) for column in columns))
+        if self._table_.compressed:
+            return [self._table_.to_item(row, columns) for row in values]
+        return [dict(zip(columns, row)) for row in values]
+
+    def _lookup_(self, query: Query) -> Optional[Set[int]]:
+        # Slots found through the indexes, None when the query needs a scan
+        if isinstance(query, ComposedCondition):
+            left, right = self._lookup_(query.left), self._lookup_(query.right)
+            if query.operator == QueryOperator.OR:
+                return left | right if left is not None and right is not None else None
+            if left is not None and right is not None:
+                return left & right
+            if left is not None:
+                return set(self._matches_(query.right, left))
+            if right is not None:
+                return set(self._matches_(query.left, right))
+            return None
+        if isinstance(query, NegatedCondition):
+            return None
+        operator, target = query.operator, query.target
+        if query.field_name == self._table_.key and operator in (QueryOperator.EQ, QueryOperator.ANY):
+            values = [target] if operator == QueryOperator.EQ else target
+            return {
+                self._slots_[value]
+                for value in map(stored, values)
+                if value is not None and value in self._slots_
+            }
+        index = self._indexes_.get(query.field_name)
+        if index is None or operator == QueryOperator.NE:
+            return None
+        if operator == QueryOperator.ANY:
+            return {
+                slot
+                for value in target
+                for slot in index_range(index, QueryOperator.EQ, value)
+            }
+        return set(index_range(index, operator, target))
+
+    def _matches_(self, query: Query, slots: Iterable[int]) -> List[int]:
+        if isinstance(query, (ComposedCondition, NegatedCondition)):
+            test = self._compile_(query)
+            return [slot for slot in slots if test(slot)]
+        # Plain conditions test the column values directly, saving a call per slot
+        slots = list(slots)
+        values = map(self._columns_[query.field_name].__getitem__, slots)
+        return [slot for slot, match in zip(slots, map(condition(query.operator, query.target), values)) if match]
+
+    def _compile_(self, query: Query) -> Predicate:
+        # Three-valued, None stands for NULL, as in SQLite
+        if isinstance(query, ComposedCondition):
+            left, right = self._compile_(query.left), self._compile_(query.right)
+            if query.operator == QueryOperator.OR:
+                return lambda slot: sql_or(left(slot), right, slot)
+            return lambda slot: sql_and(left(slot), right, slot)
+        if isinstance(query, NegatedCondition):
+            inner = self._compile_(query.query)
+            return lambda slot: sql_not(inner(slot))
+        values = self._columns_[query.field_name]
+        test = condition(query.operator, query.target)
+        return lambda slot: test(values[slot])
+
+    def _sort_(self, slots: List[int], sort: Sort):
+        orders = sort.sort_order if isinstance(sort, SortOrder) else [sort]
+        # Stable sorts, from the last order to the first
+        for order in reversed(orders):
+            values = self._columns_[order.field_name]
+            slots.sort(key=lambda slot: sort_key(values[slot]), reverse=order.sort_type == QuerySort.DESC)
+
+
+def stored(value: Any) -> Any:
+    # The value SQLite gives back for a bound value
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return value
+
+
+def sort_key(value: Any) -> Tuple:
+    # SQLite orders NULL, then numbers, then texts, then blobs
+    if value is None:
+        return 0, None
+    if isinstance(value, (int, float)):
+        return 1, value
+    if isinstance(value, str):
+        return 2, value
+    return 3, stored(value)
+
+
+def compare(value: Any, target: Any) -> Optional[int]:
+    if value is None or target is None:
+        return None
+    value_key, target_key = sort_key(value), sort_key(target)
+    return (value_key > target_key) - (value_key < target_key)
+
+
+def condition(operator: QueryOperator, target: Any) -> Callable[[Any], Optional[bool]]:
+    if operator == QueryOperator.IS_NULL:
+        return lambda value: value is None
+    if operator == QueryOperator.NOT_NULL:
+        return lambda value: value is not None
+    if operator == QueryOperator.ANY:
+        targets = {sort_key(value) for value in target if value is not None}
+        # A NULL in the list makes a miss unknown instead of false
+        miss = None if any(value is None for value in target) else False
+        return lambda value: None if value is None else (True if sort_key(value) in targets else miss)
+    if operator == QueryOperator.BETWEEN:
+        low, high = target
+        if low is not None and high is not None:
+            low_key, high_key = sort_key(low), sort_key(high)
+            return lambda value: None if value is None else low_key <= sort_key(value) <= high_key
+        return lambda value: sql_and(
+            sql_test(compare(value, low), lambda x: x >= 0),
+            lambda bound: sql_test(compare(value, bound), lambda x: x <= 0),
+            high,
+        )
+    if operator == QueryOperator.PREFIX:
+        return lambda value: value.startswith(target) if type(value) is str else None if value is None else False
+    comparisons = {
+        QueryOperator.EQ: eq,
+        QueryOperator.NE: ne,
+        QueryOperator.LT: lt,
+        QueryOperator.LE: le,
+        QueryOperator.GT: gt,
+        QueryOperator.GE: ge,
+    }
+    comparison = comparisons[operator]
+    if target is None:
+        return lambda value: None
+    target_type, target_key = type(target), sort_key(target)
+    # Values of the type of the target compare directly, others by their SQLite order
+    return lambda value: (
+        comparison(value, target) if type(value) is target_type
+        else None if value is None
+        else comparison(sort_key(value), target_key)
+    )
+
+
+def sql_test(comparison: Optional[int], test: Callable[[int], bool]) -> Optional[bool]:
+    return None if comparison is None else test(comparison)
+
+
+def sql_and(left: Optional[bool], right: Predicate, slot: Any) -> Optional[bool]:
+    if left is False:
+        return False
+    right_value = right(slot)
+    if right_value is False:
+        return False
+    return True if left and right_value else None
+
+
+def sql_or(left: Optional[bool], right: Predicate, slot: Any) -> Optional[bool]:
+    if left:
+        return True
+    right_value = right(slot)
+    if right_value:
+        return True
+    return None if left is None or right_value is None else False
+
+
+def sql_not(value: Optional[bool]) -> Optional[bool]:
+    return None if value is None else not value
+
+
+def index_range(index: List[Tuple], operator: QueryOperator, target: Any) -> Iterable[int]:
+    if operator == QueryOperator.IS_NULL:
+        low, high = bisect_left(index, (0,)), bisect_left(index, (1,))
+    elif operator == QueryOperator.NOT_NULL:
+        low, high = bisect_left(index, (1,)), len(index)
+    elif operator == QueryOperator.BETWEEN:
+        if None in target:
+            return []
+        low, high = bisect_left(index, sort_key(target[0])), bisect_left(index, sort_key(target[1]) + (_LAST,))
+    elif target is None:
+        # Comparisons with NULL are never true
+        return []
+    elif operator == QueryOperator.PREFIX:
+        upper = prefix_upper_bound(target)
+        low = bisect_left(index, (2, target))
+        high = bisect_left(index, (2, upper)) if upper is not None else bisect_left(index, (3,))
+    else:
+        key = sort_key(target)
+        # NULLs sort first and never compare
+        bounds = {
+            QueryOperator.EQ: lambda: (bisect_left(index, key), bisect_left(index, key + (_LAST,))),
+            QueryOperator.LT: lambda: (bisect_left(index, (1,)), bisect_left(index, key)),
+            QueryOperator.LE: lambda: (bisect_left(index, (1,)), bisect_left(index, key + (_LAST,))),
+            QueryOperator.GT: lambda: (bisect_left(index, key + (_LAST,)), len(index)),
+            QueryOperator.GE: lambda: (bisect_left(index, key), len(index)),
+        }
+        low, high = bounds[operator]()
+    return [entry[-1] for entry in index[low:high]]
@@ -1,18 +1,58 @@
-from typing import List, Set
+from typing import List, Set, Dict, Optional, Any, Callable, Tuple, TYPE_CHECKING
 
 from litedb.bucket import Bucket
-from litedb.catalog import DB
-from litedb.erros import (BucketNotFound, InvalidKey, BucketSchemaChanged, RepositoryIsClosed)
+from litedb.catalog import DB, LockStats
+from litedb.compression import CODECS
+from litedb.erros import (BucketNotFound, InvalidKey, BucketSchemaChanged, RepositoryIsClosed, InvalidField,
+                          InvalidPartition)
 from litedb.model import Field
+from litedb.tuning import PRAGMAS, resolve_pragmas
+
+# Optional components are imported when first used, so opening a repository stays cheap
+if TYPE_CHECKING:
+    from litedb.buffer import BufferedBucket
+    from litedb.cache import QueryCache
+    from litedb.maintenance import Maintenance, MaintenanceStep
+    from litedb.migration import Backfill, MigrationProgress
+    from litedb.partition import PartitionedBucket
+    from litedb.replica import Replica
 
 
 class Repository:
-    def __init__(self, repository_name: str = None):
+    def __init__(
+            self,
+            repository_name: str = None,
+            cache_size: int = 0,
+            profile: Optional[str] = None,
+            pragmas: Optional[Dict[str, Any]] = None,
+            maintenance_interval: Optional[float] = None,
+            busy_timeout: float = 5.0,
+            write_retries: int = 5,
+    ):
         self.is_closed = False
         self.in_memory = repository_name is None
         self.repository_name = repository_name
-        self._db_ = DB(':memory:' if self.in_memory else repository_name)
-        self.schemas = self._db_.catalog()
+        self.profile = profile
+        self._db_ = DB(
+            ':memory:' if self.in_memory else repository_name,
+            pragmas=resolve_pragmas(profile, pragmas),
+            busy_timeout=busy_timeout,
+            write_retries=write_retries,
+        )
+        # Query results cache, bounded to cache_size bytes, disabled when 0
+        self.cache: Optional['QueryCache'] = None
+        if cache_size > 0:
+            from litedb.cache import QueryCache
+            self.cache = QueryCache(cache_size)
+        # Catalog entries are decoded when each bucket is first used
+        self.schemas: Dict[str, List[Field]] = {}
+        self.ttls: Dict[str, float] = {}
+        self.partitions: Dict[str, Dict[str, Any]] = {}
+        self._buffers_: Dict[str, 'BufferedBucket'] = {}
+        self._replicas_: Dict[str, 'Replica'] = {}
+        self._maintenance_: Optional['Maintenance'] = None
+        if maintenance_interval is not None:
+            self.maintenance.start(maintenance_interval)
 
     def __str__(self):
         return f'{self.__class__.__name__}({self.repository_name})'
@@ -27,51 +67,262 @@ class Repository:
     def __exit__(self, *args):
         self.close()
 
+    @property
+    def settings(self) -> Dict[str, Any]:
+        self._check_repository_is_open_()
+        return self._db_.settings(PRAGMAS)
+
+    @property
+    def lock_stats(self) -> LockStats:
+        return self._db_.lock_stats()
+
+    @property
+    def maintenance(self) -> 'Maintenance':
+        if self._maintenance_ is None:
+            from litedb.maintenance import Maintenance
+            self._maintenance_ = Maintenance(self._db_)
+        return self._maintenance_
+
     @property
     def buckets(self) -> Set[str]:
-        return set(self.schemas.keys())
+        if self.is_closed:
+            return set()
+        return set(self._db_.names())
 
     def bucket(self, name: str) -> Bucket:
         self._check_repository_is_open_()
-        schema = self.schemas.get(name)
+        schema = self._schema_(name)
         if schema is None:
             raise BucketNotFound(name)
+        partition = self.partitions.get(name)
+        if partition is not None:
+            from litedb.partition import PartitionedBucket
+            return PartitionedBucket(
+                db=self._db_,
+                name=name,
+                schema=schema,
+                partition_by=partition['field'],
+                period=partition['period'],
+                retention=partition.get('retention'),
+            )
         return Bucket(
             db=self._db_,
             name=name,
             schema=schema,
+            cache=self.cache,
+            ttl=self.ttls.get(name),
+        )
+
+    def buffered_bucket(self, name: str, max_items: int = 1000, max_delay: float = 1.0) -> 'BufferedBucket':
+        self._check_repository_is_open_()
+        buffered = self._buffers_.get(name)
+        if buffered is not None:
+            return buffered
+        schema = self._schema_(name)
+        if schema is None:
+            raise BucketNotFound(name)
+        if name in self.partitions:
+            raise InvalidPartition(f"Partitioned bucket {name} can't be buffered")
+        from litedb.buffer import BufferedBucket
+        buffered = BufferedBucket(
+            db=self._db_,
+            name=name,
+            schema=schema,
+            cache=self.cache,
+            ttl=self.ttls.get(name),
+            max_items=max_items,
+            max_delay=max_delay,
+        )
+        self._buffers_[name] = buffered
+        return buffered
+
+    def replica(self, name: str, refresh_interval: float = 1.0) -> 'Replica':
+        self._check_repository_is_open_()
+        replica = self._replicas_.get(name)
+        if replica is not None:
+            return replica
+        bucket = self.bucket(name)
+        if bucket.partition_by is not None:
+            raise InvalidPartition(f"Partitioned bucket {name} can't be replicated")
+        from litedb.replica import Replica
+        replica = Replica(bucket, refresh_interval)
+        self._replicas_[name] = replica
+        return replica
+
+    def flush(self):
+        self._check_repository_is_open_()
+        for buffered in self._buffers_.values():
+            buffered.flush()
+
+    def sweep(self, max_rows: int = 1000) -> int:
+        self._check_repository_is_open_()
+        return sum(
+            self.bucket(name).sweep(max_rows)
+            for name in self._db_.expiring()
         )
 
-    def create_bucket(self, name: str, schema: List[Field], update_if_needed: bool = False) -> Bucket:
+    def maintain(self, budget_ms: float = 50) -> List['MaintenanceStep']:
+        self._check_repository_is_open_()
+        return self.maintenance.run(budget_ms)
+
+    def create_bucket(
+            self,
+            name: str,
+            schema: List[Field],
+            update_if_needed: bool = False,
+            backfill: Optional[Dict[str, 'Backfill']] = None,
+            batch_size: int = 1000,
+            progress: Optional[Callable[['MigrationProgress'], None]] = None,
+            ttl: Optional[float] = None,
+            partition_by: Optional[str] = None,
+            partition_period: float = 86400,
+            retention: Optional[float] = None,
+    ) -> Bucket:
         self._check_repository_is_open_()
         # Check number of keys
         check_key(schema)
+        check_compression(schema)
+        partition = None
+        if partition_by is not None:
+            partition = {'field': partition_by, 'period': partition_period, 'retention': retention}
+            check_partition(schema, partition, ttl)
         # Check if bucket exists
-        old_schema = self.schemas.get(name)
+        old_schema = self._schema_(name)
 
         if old_schema is None:
-            self._db_.create(name, schema)
+            parent = self._db_.parent(name)
+            if parent is not None:
+                raise InvalidPartition(f'{name} is a partition of bucket {parent}')
+            self._db_.create(name, schema, ttl, partition)
             self.schemas[name] = schema
-        elif old_schema != schema:
+            self._set_ttl_(name, ttl)
+            self._set_partition_(name, partition)
+            return self.bucket(name)
+
+        old_partition = self.partitions.get(name)
+        if old_partition is not None or partition is not None:
+            self._update_partition_(name, old_schema, schema, old_partition, partition, update_if_needed)
+            return self.bucket(name)
+
+        from litedb.migration import Migration
+        migration = Migration(self._db_, name, backfill, batch_size, progress)
+        # Finish a migration interrupted by a crash before starting a new one
+        state = self._db_.migration(name)
+        if state is not None and update_if_needed:
+            self._close_buffer_(name)
+            self._close_replica_(name)
+            migration.resume(state)
+            self.schemas.pop(name, None)
+            old_schema = self._schema_(name)
+
+        if old_schema != schema:
             if update_if_needed:
-                self._db_.alter(name, schema)
+                self._close_buffer_(name)
+                self._close_replica_(name)
+                migration.start(old_schema, schema)
                 self.schemas[name] = schema
             else:
                 raise BucketSchemaChanged(name)
 
+        if self.ttls.get(name) != ttl:
+            if not update_if_needed:
+                raise BucketSchemaChanged(name)
+            self._close_buffer_(name)
+            self._close_replica_(name)
+            self._db_.expire(name, ttl)
+            self._set_ttl_(name, ttl)
+
         return self.bucket(name)
 
     def drop_bucket(self, name: str):
         self._check_repository_is_open_()
-        schema = self.schemas.pop(name, None)
+        schema = self._schema_(name)
         if schema is not None:
+            self.schemas.pop(name)
+            self._close_buffer_(name)
+            self._close_replica_(name)
             self._db_.drop(name)
+            self.ttls.pop(name, None)
+            self.partitions.pop(name, None)
+            if self.cache is not None:
+                self.cache.invalidate(name)
 
     def close(self):
         self._check_repository_is_open_()
-        self._db_.close()
-        self.schemas = {}
-        self.is_closed = True
+        try:
+            if self._maintenance_ is not None:
+                self._maintenance_.stop()
+            errors = []
+            for name in list(self._buffers_.keys()):
+                # Every buffer is flushed, even when another one fails
+                try:
+                    self._close_buffer_(name)
+                except Exception as error:
+                    errors.append(error)
+            for name in list(self._replicas_.keys()):
+                self._close_replica_(name)
+            if errors:
+                raise errors[0]
+        finally:
+            self._db_.close()
+            self.schemas = {}
+            self.ttls = {}
+            self.partitions = {}
+            self.is_closed = True
+
+    def _schema_(self, name: str) -> Optional[List[Field]]:
+        if name not in self.schemas:
+            entry = self._db_.entry(name)
+            if entry is None:
+                return None
+            self.schemas[name], options = entry
+            self._set_ttl_(name, options.get('ttl'))
+            self._set_partition_(name, options.get('partition'))
+        return self.schemas[name]
+
+    def _update_partition_(
+            self,
+            name: str,
+            old_schema: List[Field],
+            schema: List[Field],
+            old_partition: Optional[Dict[str, Any]],
+            partition: Optional[Dict[str, Any]],
+            update_if_needed: bool,
+    ):
+        # Partitions would have to be rewritten, only the retention can change
+        if partition_layout(old_partition) != partition_layout(partition):
+            raise InvalidPartition(f"Partitioning of bucket {name} can't be changed")
+        if old_schema != schema:
+            if update_if_needed:
+                raise InvalidPartition(f"Schema of partitioned bucket {name} can't be changed")
+            raise BucketSchemaChanged(name)
+        if old_partition != partition:
+            if not update_if_needed:
+                raise BucketSchemaChanged(name)
+            self._db_.partition(name, partition)
+            self._set_partition_(name, partition)
+
+    def _set_ttl_(self, name: str, ttl: Optional[float]):
+        if ttl is None:
+            self.ttls.pop(name, None)
+        else:
+            self.ttls[name] = ttl
+
+    def _set_partition_(self, name: str, partition: Optional[Dict[str, Any]]):
+        if partition is None:
+            self.partitions.pop(name, None)
+        else:
+            self.partitions[name] = partition
+
+    def _close_buffer_(self, name: str):
+        buffered = self._buffers_.pop(name, None)
+        if buffered is not None:
+            buffered.close()
+
+    def _close_replica_(self, name: str):
+        replica = self._replicas_.pop(name, None)
+        if replica is not None:
+            replica.close()
 
     def _check_repository_is_open_(self):
         if self.is_closed:
@@ -82,3 +333,31 @@ def check_key(schema: List[Field]):
     key_count = len(list(filter(lambda x: x.is_key, schema)))
     if key_count != 1:
         raise InvalidKey(key_count)
+
+
+def check_compression(schema: List[Field]):
+    for field in schema:
+        if field.compression is None:
+            continue
+        if field.compression not in CODECS:
+            raise InvalidField(field.name, f'has an unknown compression {field.compression}')
+        # Compressed values can't be compared, so they can't be looked up
+        if field.is_key or field.indexed:
+            raise InvalidField(field.name, "can't be compressed, it is a key or indexed")
+
+
+def partition_layout(partition: Optional[Dict[str, Any]]) -> Optional[Tuple[str, float]]:
+    return None if partition is None else (partition['field'], partition['period'])
+
+
+def check_partition(schema: List[Field], partition: Dict[str, Any], ttl: Optional[float]):
+    fields = {field.name: field for field in schema}
+    field = fields.get(partition['field'])
+    if field is None:
+        raise InvalidPartition(f'Partition field {partition["field"]} is not in the schema')
+    if field.is_key or field.compression is not None:
+        raise InvalidPartition(f"Partition field {field.name} can't be the key or compressed")
+    if partition['period'] <= 0:
+        raise InvalidPartition('Partition period must be positive')
+    if ttl is not None:
+        raise InvalidPartition('Partitioned buckets expire items with a retention, not a ttl')
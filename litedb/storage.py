@@ -1,66 +1,294 @@
-from typing import Optional, Dict, Any, List, Tuple, Iterable, Callable
-
-from litedb.catalog import DB
+import json
+import sqlite3
+import time
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Callable, NamedTuple, Union
+
+from litedb.catalog import DB, EXPIRES_AT
+from litedb.compression import compress, decompress
+from litedb.erros import InvalidField
 from litedb.model import Field
-from litedb.query import Sort, Query
+from litedb.query import Sort, Query, QueryOperator, ComposedCondition, NegatedCondition, Expression, UpdateOperator
+
+# Longer lists are bound as a single json array, so the statement doesn't grow with the list
+MAX_INLINE_VALUES = 32
+# Rows fetched from SQLite at a time while iterating results
+CHUNK_SIZE = 256
+# Keys looked up at a time while counting the items a save will update
+KEYS_CHUNK_SIZE = 10_000
+# Values SQLite stores without an adapter, integers must fit in 64 bits
+STORABLE_TYPES = (type(None), int, float, str, bytes, bytearray, memoryview)
+MIN_INTEGER, MAX_INTEGER = -2 ** 63, 2 ** 63 - 1
+
+
+class SaveResult(NamedTuple):
+    inserted: int
+    updated: int
+    unchanged: int
+
+
+# Changes of an update by field, new values or expressions of the current ones
+Changes = Dict[str, Any]
+# Number of updated rows, or the updated rows when they are returned
+UpdateResult = Union[int, List[Dict[str, Any]]]
 
 
 class Table:
-    def __init__(self, name: str, schema: List[Field]):
+    def __init__(self, name: str, schema: List[Field], ttl: Optional[float] = None):
         self.name = name
         self.schema = schema
+        self.ttl = ttl
         self.key = find_bucket_key(schema)
         self.fields = [
             field.name
             for field in schema
         ]
+        # Stored columns, expiring tables also keep the expiry time of each item
+        self.columns = self.fields + [EXPIRES_AT] if ttl is not None else self.fields
         self.template = {
-            field: None
-            for field in self.fields
+            field.name: field.default
+            for field in schema
+        }
+        self.compressed = {
+            field.name: (field.compression, field.compression_threshold)
+            for field in schema
+            if field.compression is not None
         }
+        # Hides expired items, items saved before the bucket had a ttl never expire
+        self.live = sql_live() if ttl is not None else None
         self.sql = SQL(self)
 
-    def insert(self, db: DB, items: Iterable[Dict[str, Any]]):
-        self._store_(db, self.sql.insert, items)
-
-    def upsert(self, db: DB, items: Iterable[Dict[str, Any]]):
-        self._store_(db, self.sql.upsert, items)
-
-    def _store_(self, db: DB, sql: str, items: Iterable[Dict[str, Any]]):
-        full_item = map(lambda item: self.template | item, items)
-        with db.conn:
-            cur = db.conn.cursor()
-            cur.executemany(sql, full_item)
+    def insert(self, db: DB, items: Iterable[Dict[str, Any]], ttl: Optional[float] = None) -> SaveResult:
+        # A list, so the rows can be written again if the transaction is retried
+        rows = list(self._rows_(items, ttl))
+        if self.ttl is None:
+            db.write(self.name, lambda cur: cur.executemany(self.sql.insert, rows), (rows, []))
+            return SaveResult(len(rows), 0, 0)
+        # Expired items not swept yet must not block inserting their key again
+        now = time.time()
+        keys = [{'key': row[self.key], 'now': now} for row in rows]
+
+        def store(cur: sqlite3.Cursor):
+            cur.executemany(sql_delete_expired(self.name, self.key), keys)
+            cur.executemany(self.sql.insert, rows)
+
+        db.write(self.name, store, (rows, []))
+        return SaveResult(len(rows), 0, 0)
+
+    def upsert(self, db: DB, items: Iterable[Dict[str, Any]], ttl: Optional[float] = None) -> SaveResult:
+        rows = list(self._rows_(items, ttl))
+        return db.write(self.name, lambda cur: self.store(cur, rows), (rows, []))
+
+    def store(self, cur: sqlite3.Cursor, rows: List[Dict[str, Any]]) -> SaveResult:
+        keys = list({row[self.key] for row in rows})
+        existing = self._count_keys_(cur, keys)
+        # Unchanged rows are skipped by the upsert, so they don't count as changes
+        changes = cur.connection.total_changes
+        cur.executemany(self.sql.upsert, rows)
+        changes = cur.connection.total_changes - changes
+        inserted = len(keys) - existing
+        return SaveResult(inserted, changes - inserted, len(rows) - changes)
+
+    def _count_keys_(self, cur: sqlite3.Cursor, keys: List[Any]) -> int:
+        count = 0
+        for start in range(0, len(keys), KEYS_CHUNK_SIZE):
+            params = self._params_()
+            sql = sql_count_keys(self.name, self.key, sql_values(params, keys[start:start + KEYS_CHUNK_SIZE]), self.live)
+            count += cur.execute(sql, params).fetchone()[0]
+        return count
+
+    def delete_keys(self, cur: sqlite3.Cursor, keys: List[Any]) -> int:
+        deleted = 0
+        for start in range(0, len(keys), KEYS_CHUNK_SIZE):
+            params = {}
+            sql = sql_delete_keys(self.name, self.key, sql_values(params, keys[start:start + KEYS_CHUNK_SIZE]))
+            deleted += cur.execute(sql, params).rowcount
+        return deleted
+
+    def _rows_(self, items: Iterable[Dict[str, Any]], ttl: Optional[float]) -> Iterable[Dict[str, Any]]:
+        if self.ttl is None:
+            rows = map(lambda item: self.template | item, items)
+        else:
+            expires = {EXPIRES_AT: time.time() + (ttl if ttl is not None else self.ttl)}
+            rows = map(lambda item: self.template | item | expires, items)
+        if self.compressed:
+            return map(self.encode, rows)
+        return rows
+
+    def encode(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        for name, (codec, threshold) in self.compressed.items():
+            row[name] = compress(row[name], codec, threshold)
+        return row
+
+    def check(self, item: Dict[str, Any]):
+        for name, value in item.items():
+            if name in self.template and not is_storable(value):
+                raise InvalidField(name, f"can't store a value of type {type(value).__name__}")
+
+    def check_query(self, query: Query):
+        # Conditions would compare the stored blobs, not the values
+        for name in query_fields(query):
+            if name in self.compressed:
+                raise InvalidField(name, "is compressed and can't be queried")
+
+    def to_item(self, values: Tuple, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        item = to_item(fields or self.fields, values)
+        # Only the fields that were read are decompressed
+        for name in self.compressed:
+            if name in item:
+                item[name] = decompress(item[name])
+        return item
+
+    def project(self, fields: Optional[Iterable[str]]) -> List[str]:
+        if fields is None:
+            return self.fields
+        return [field for field in self.fields if field in fields]
+
+    def _params_(self, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        params = params or {}
+        if self.ttl is not None:
+            params['now'] = time.time()
+        return params
+
+    def sweep(self, db: DB, max_rows: int) -> int:
+        params = {'now': time.time(), 'limit': max_rows}
+        return db.write(self.name, lambda cur: cur.execute(sql_sweep(self.name), params).rowcount)
 
     def delete(self, db: DB, key: Any):
-        with db.conn:
-            cur = db.conn.cursor()
-            cur.execute(self.sql.delete, {'key': key})
-
-    def find_by_key(self, db: DB, key: Any) -> Optional[Dict[str, Any]]:
+        db.write(self.name, lambda cur: cur.execute(self.sql.delete, {'key': key}), ([], [key]))
+
+    def apply(self, db: DB, items: Iterable[Dict[str, Any]], keys: Iterable[Any]):
+        full_item = list(self._rows_(items, None))
+        keys = list(keys)
+        key_params = [{'key': key} for key in keys]
+
+        def store(cur: sqlite3.Cursor):
+            cur.executemany(self.sql.upsert, full_item)
+            cur.executemany(self.sql.delete, key_params)
+
+        db.write(self.name, store, (full_item, keys))
+
+    def update_keys(self, db: DB, changes: Iterable[Tuple[Any, Changes]], returning: bool = False) -> UpdateResult:
+        changes = list(changes)
+        return self._update_(db, lambda cur, rows: self.modify_keys(cur, changes, rows), returning)
+
+    def update_matches(self, db: DB, query: Query, changes: Changes, returning: bool = False) -> UpdateResult:
+        return self._update_(db, lambda cur, rows: self.modify_matches(cur, query, changes, rows), returning)
+
+    def _update_(
+            self,
+            db: DB,
+            operation: Callable[[sqlite3.Cursor, bool], UpdateResult],
+            returning: bool,
+    ) -> UpdateResult:
+        with db.lock:
+            # Listeners get the stored rows, so they are returned from the update even if not asked for.
+            # Checked under the lock, a listener registering meanwhile would miss the update
+            notify = self.name in db.listeners
+            result = db.write(self.name, lambda cur: operation(cur, returning or notify))
+            if notify:
+                db.notify(self.name, result, [])
+        if notify and not returning:
+            return len(result)
+        return result
+
+    def modify_keys(self, cur: sqlite3.Cursor, changes: List[Tuple[Any, Changes]], returning: bool) -> UpdateResult:
+        rows, count = [], 0
+        for key, item_changes in changes:
+            if not item_changes:
+                continue
+            params = self._params_({'key': key})
+            cur.execute(self._sql_update_(item_changes, params, f'{self.key}=:key', returning), params)
+            if returning:
+                rows.extend(self._returned_(cur))
+            else:
+                count += cur.rowcount
+        return rows if returning else count
+
+    def modify_matches(self, cur: sqlite3.Cursor, query: Query, changes: Changes, returning: bool) -> UpdateResult:
+        self.check_query(query)
+        if not changes:
+            return [] if returning else 0
+        params = self._params_()
+        cur.execute(self._sql_update_(changes, params, sql_condition(query, params), returning), params)
+        return self._returned_(cur) if returning else cur.rowcount
+
+    def _sql_update_(self, changes: Changes, params: Dict[str, Any], where_clause: str, returning: bool) -> str:
+        set_clause = sql_set(self._changes_(changes), params)
+        if self.live is not None:
+            where_clause = f'{where_clause} and {self.live}'
+        return sql_update(self.name, set_clause, where_clause, self.columns if returning else None)
+
+    def _changes_(self, changes: Changes) -> Changes:
+        for name, change in changes.items():
+            if name not in self.template:
+                raise InvalidField(name, f'is not a field of {self.name}')
+            if name == self.key:
+                raise InvalidField(name, "is the key and can't be updated")
+            if name in self.compressed:
+                if isinstance(change, Expression):
+                    raise InvalidField(name, "is compressed and can't be updated with an expression")
+                changes = changes | {name: compress(change, *self.compressed[name])}
+        return changes
+
+    def _returned_(self, cur: sqlite3.Cursor) -> List[Dict[str, Any]]:
+        return [dict(zip(self.columns, values)) for values in cur.fetchall()]
+
+    def from_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        return self.to_item(tuple(row[field] for field in self.fields))
+
+    def find_by_key(self, db: DB, key: Any, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
+        columns = self.project(fields)
+        sql = self.sql.find_by_pk if fields is None else sql_find_by_pk(self.name, columns, self.key, self.live)
         cur = db.conn.cursor()
-        cur.execute(self.sql.find_by_pk, {'key': key})
+        cur.execute(sql, self._params_({'key': key}))
         values = cur.fetchone()
-        return to_item(self.fields, values) if values is not None else None
-
-    def fetch_all(self, db: DB) -> Iterable[Dict[str, Any]]:
-        return self._iterable_(db, self.sql.find_all)
-
-    def fetch(self, db: DB, query: Query, sort: Optional[Sort]) -> Iterable[Dict[str, Any]]:
-        sql = sql_filter(self.name, self.fields, query, sort)
-        return self._iterable_(db, sql)
-
-    def _iterable_(self, db: DB, sql: str) -> Iterable[Dict[str, Any]]:
+        return self.to_item(values, columns) if values is not None else None
+
+    def fetch_all(self, db: DB, fields: Optional[Iterable[str]] = None) -> Iterable[Dict[str, Any]]:
+        columns = self.project(fields)
+        sql = self.sql.find_all if fields is None else sql_find_all(self.name, columns, self.live)
+        return self._iterable_(db, sql, columns=columns)
+
+    def fetch(
+            self,
+            db: DB,
+            query: Query,
+            sort: Optional[Sort],
+            fields: Optional[Iterable[str]] = None,
+    ) -> Iterable[Dict[str, Any]]:
+        self.check_query(query)
+        columns = self.project(fields)
+        sql, params = sql_filter(self.name, columns, query, sort, self.live)
+        return self._iterable_(db, sql, params, columns)
+
+    def explain(self, db: DB, query: Query, sort: Optional[Sort]) -> List[str]:
+        self.check_query(query)
+        sql, params = sql_filter(self.name, self.fields, query, sort, self.live)
         cur = db.conn.cursor()
-        cur.execute(sql)
-        values = cur.fetchone()
-        while values is not None:
-            yield to_item(self.fields, values)
-            values = cur.fetchone()
+        cur.execute(f'explain query plan {sql}', self._params_(params))
+        return [row[3] for row in cur.fetchall()]
+
+    def _iterable_(
+            self,
+            db: DB,
+            sql: str,
+            params: Dict[str, Any] = None,
+            columns: Optional[List[str]] = None,
+    ) -> Iterable[Dict[str, Any]]:
+        cur = db.conn.cursor()
+        cur.execute(sql, self._params_(params))
+        if not self.compressed:
+            return iterate(cur, lambda values: to_item(columns or self.fields, values))
+        return iterate(cur, lambda values: self.to_item(values, columns))
 
-    def count(self, db: DB) -> int:
+    def count(self, db: DB, query: Optional[Query] = None) -> int:
         cur = db.conn.cursor()
-        cur.execute(self.sql.count)
+        if query is None:
+            cur.execute(self.sql.count, self._params_())
+        else:
+            self.check_query(query)
+            where_clause, params = sql_where(query)
+            cur.execute(sql_count(self.name, self.live, where_clause), self._params_(params))
         values = cur.fetchone()
         return values[0]
 
@@ -72,10 +300,24 @@ def find_bucket_key(schema: List[Field]) -> Optional[str]:
     return None
 
 
+def is_storable(value: Any) -> bool:
+    if isinstance(value, int):
+        return MIN_INTEGER <= value <= MAX_INTEGER
+    return isinstance(value, STORABLE_TYPES) or (type(value), sqlite3.PrepareProtocol) in sqlite3.adapters
+
+
 def to_item(fields: List[str], values: Tuple) -> Dict[str, Any]:
     return dict(zip(fields, values))
 
 
+def iterate(cur: sqlite3.Cursor, mapper: Callable[[Tuple], Any]) -> Iterable[Any]:
+    rows = cur.fetchmany(CHUNK_SIZE)
+    while rows:
+        for values in rows:
+            yield mapper(values)
+        rows = cur.fetchmany(CHUNK_SIZE)
+
+
 class SQL:
     def __init__(self, table: Table):
         self.table = table
@@ -95,31 +337,31 @@ class SQL:
     @property
     def insert(self) -> str:
         if self._insert_ is None:
-            _insert_ = sql_insert(self.table.name, self.table.fields)
+            self._insert_ = sql_insert(self.table.name, self.table.columns)
         return self._insert_
 
     @property
     def upsert(self) -> str:
         if self._upsert_ is None:
-            _upsert_ = sql_upsert(self.table.name, self.table.key, self.table.fields)
+            self._upsert_ = sql_upsert(self.table.name, self.table.key, self.table.columns)
         return self._upsert_
 
     @property
     def find_by_pk(self) -> str:
         if self._find_by_pk_ is None:
-            _find_by_pk_ = sql_find_by_pk(self.table.name, self.table.fields, self.table.key)
+            self._find_by_pk_ = sql_find_by_pk(self.table.name, self.table.fields, self.table.key, self.table.live)
         return self._find_by_pk_
 
     @property
     def find_all(self) -> str:
         if self._find_all_ is None:
-            _find_all_ = sql_find_all(self.table.name, self.table.fields)
+            self._find_all_ = sql_find_all(self.table.name, self.table.fields, self.table.live)
         return self._find_all_
 
     @property
     def count(self) -> str:
         if self._count_ is None:
-            _count_ = sql_count(self.table.name)
+            self._count_ = sql_count(self.table.name, self.table.live)
         return self._count_
 
 
@@ -127,6 +369,10 @@ def sql_delete(table: str, key: str) -> str:
     return f'delete from {table} where {key}=:key'
 
 
+def sql_delete_keys(table: str, key: str, values: str) -> str:
+    return f'delete from {table} where {key} in {values}'
+
+
 def sql_insert(table: str, fields: List[str]) -> str:
     fields_str = ','.join(fields)
     params_str = ','.join(map(lambda x: f':{x}', fields))
@@ -135,28 +381,161 @@ def sql_insert(table: str, fields: List[str]) -> str:
 
 def sql_upsert(table: str, key: str, fields: List[str]) -> str:
     insert_str = sql_insert(table, fields)
-    update_str = ','.join(map(lambda x: f'{x}=:{x}', fields))
-    return f'{insert_str} on conflict({key}) do update set {update_str} where {key}=:{key}'
+    values = [field for field in fields if field != key]
+    if not values:
+        return f'{insert_str} on conflict({key}) do nothing'
+    update_str = ','.join(map(lambda x: f'{x}=excluded.{x}', values))
+    # Identical rows are not rewritten, so they don't dirty pages or grow the journal
+    changed_str = ' or '.join(map(lambda x: f'{x} is not excluded.{x}', values))
+    return f'{insert_str} on conflict({key}) do update set {update_str} where {changed_str}'
+
+
+def sql_update(table: str, set_clause: str, where_clause: str, returning: Optional[List[str]] = None) -> str:
+    if returning is None:
+        return f'update {table} set {set_clause} where {where_clause}'
+    return f'update {table} set {set_clause} where {where_clause} returning {",".join(returning)}'
+
+
+def sql_set(changes: Changes, params: Dict[str, Any]) -> str:
+    assignments = []
+    for field, change in changes.items():
+        if not isinstance(change, Expression):
+            assignments.append(f'{field}={bind(params, change)}')
+            continue
+        value = bind(params, change.value)
+        if change.operator == UpdateOperator.ADD:
+            assignments.append(f'{field}=coalesce({field},0)+{value}')
+        else:
+            # Scalar max and min are NULL when any argument is
+            function = 'max' if change.operator == UpdateOperator.MAX else 'min'
+            assignments.append(f'{field}={function}(coalesce({field},{value}),{value})')
+    return ','.join(assignments)
+
+
+def sql_find_by_pk(table: str, fields: List[str], key: str, live: Optional[str] = None) -> str:
+    fields_str = ','.join(fields)
+    if live is None:
+        return f'select {fields_str} from {table} where {key}=:key'
+    return f'select {fields_str} from {table} where {key}=:key and {live}'
 
 
-def sql_find_by_pk(table: str, fields: List[str], key: str) -> str:
+def sql_find_all(table: str, fields: List[str], live: Optional[str] = None) -> str:
     fields_str = ','.join(fields)
-    return f'select {fields_str} from {table} where {key}=:key'
+    if live is None:
+        return f'select {fields_str} from {table}'
+    return f'select {fields_str} from {table} where {live}'
 
 
-def sql_find_all(table: str, fields: List[str]) -> str:
-    fields_str = ','.join(fields)
-    return f'select {fields_str} from {table}'
+def sql_count(table: str, live: Optional[str] = None, where_clause: Optional[str] = None) -> str:
+    conditions = [condition for condition in (where_clause, live) if condition is not None]
+    if not conditions:
+        return f'select count(*) from {table}'
+    return f'select count(*) from {table} where {" and ".join(conditions)}'
+
+
+def sql_count_keys(table: str, key: str, values: str, live: Optional[str] = None) -> str:
+    if live is None:
+        return f'select count(*) from {table} where {key} in {values}'
+    return f'select count(*) from {table} where {key} in {values} and {live}'
+
 
+def sql_live(prefix: str = '') -> str:
+    return f'({prefix}{EXPIRES_AT} is null or {prefix}{EXPIRES_AT} > :now)'
 
-def sql_count(table: str) -> str:
-    return f'select count(*) from {table}'
 
+def sql_delete_expired(table: str, key: str) -> str:
+    return f'delete from {table} where {key}=:key and {EXPIRES_AT} <= :now'
 
-def sql_filter(table: str, fields: List[str], query: Query, sort: Optional[Sort]) -> str:
+
+def sql_sweep(table: str) -> str:
+    # Range scan on the expiry index, bounded to limit rows
+    return (
+        f'delete from {table} where rowid in ('
+        f'select rowid from {table} where {EXPIRES_AT} <= :now order by {EXPIRES_AT} limit :limit)'
+    )
+
+
+def sql_filter(
+        table: str,
+        fields: List[str],
+        query: Query,
+        sort: Optional[Sort],
+        live: Optional[str] = None,
+) -> Tuple[str, Dict[str, Any]]:
     fields_str = ','.join(fields)
-    where_clause = str(query)
+    where_clause, params = sql_where(query)
+    if live is not None:
+        where_clause = f'{where_clause} and {live}'
     if sort is None:
-        return f'select {fields_str} from {table} where {where_clause}'
+        return f'select {fields_str} from {table} where {where_clause}', params
     sort_clause = str(sort)
-    return f'select {fields_str} from {table} where {where_clause} order by {sort_clause}'
+    return f'select {fields_str} from {table} where {where_clause} order by {sort_clause}', params
+
+
+def sql_where(query: Query) -> Tuple[str, Dict[str, Any]]:
+    params = {}
+    return sql_condition(query, params), params
+
+
+def sql_condition(query: Query, params: Dict[str, Any], prefix: str = '') -> str:
+    if isinstance(query, ComposedCondition):
+        left = sql_condition(query.left, params, prefix)
+        right = sql_condition(query.right, params, prefix)
+        return f'({left} {query.operator.value} {right})'
+    if isinstance(query, NegatedCondition):
+        return f'(not {sql_condition(query.query, params, prefix)})'
+    field = f'{prefix}{query.field_name}'
+    operator = query.operator
+    if operator in (QueryOperator.IS_NULL, QueryOperator.NOT_NULL):
+        return f'({field} {operator.value})'
+    if operator == QueryOperator.BETWEEN:
+        low, high = query.target
+        return f'({field} between {bind(params, low)} and {bind(params, high)})'
+    if operator == QueryOperator.PREFIX:
+        # A range instead of like, so an index on the field can be used
+        upper = prefix_upper_bound(query.target)
+        upper_str = bind(params, upper) if upper is not None else "x''"
+        return f'({field} >= {bind(params, query.target)} and {field} < {upper_str})'
+    if operator == QueryOperator.ANY:
+        return f'({field} in {sql_values(params, query.target)})'
+    return f'({field} {operator.value} {bind(params, query.target)})'
+
+
+def query_fields(query: Query) -> Iterable[str]:
+    if isinstance(query, ComposedCondition):
+        yield from query_fields(query.left)
+        yield from query_fields(query.right)
+    elif isinstance(query, NegatedCondition):
+        yield from query_fields(query.query)
+    else:
+        yield query.field_name
+
+
+def sql_values(params: Dict[str, Any], values: List[Any]) -> str:
+    if len(values) > MAX_INLINE_VALUES:
+        try:
+            return f'(select value from json_each({bind(params, json.dumps(values))}))'
+        except TypeError:
+            # Values json can't represent (e.g. bytes) are bound one by one
+            pass
+    values_str = ','.join(map(lambda x: bind(params, x), values))
+    return f'({values_str})'
+
+
+def bind(params: Dict[str, Any], value: Any) -> str:
+    name = f'p{len(params)}'
+    params[name] = value
+    return f':{name}'
+
+
+def prefix_upper_bound(prefix: str) -> Optional[str]:
+    chars = list(prefix)
+    while chars:
+        code = ord(chars.pop()) + 1
+        if code == 0xD800:
+            # Surrogates can't be encoded
+            code = 0xE000
+        if code <= 0x10FFFF:
+            return ''.join(chars) + chr(code)
+    # Every text sorts before the empty blob
+    return None
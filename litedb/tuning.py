@@ -0,0 +1,72 @@
+from typing import Any, Dict, Optional
+
+from litedb.erros import InvalidTuning
+
+# Supported settings, in the order they must be applied (auto_vacuum and page_size only work
+# before the first table is created and page_size can't be changed once in wal mode)
+PRAGMAS = (
+    'auto_vacuum',
+    'page_size',
+    'journal_mode',
+    'synchronous',
+    'cache_size',
+    'mmap_size',
+    'temp_store',
+)
+
+PROFILES: Dict[str, Dict[str, Any]] = {
+    'read_heavy': {
+        'auto_vacuum': 'incremental',
+        'page_size': 4096,
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -64 * 1024,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'memory',
+    },
+    'write_heavy': {
+        'auto_vacuum': 'incremental',
+        'page_size': 4096,
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'cache_size': -32 * 1024,
+        'mmap_size': 64 * 1024 * 1024,
+        'temp_store': 'memory',
+    },
+    'bulk_load': {
+        'auto_vacuum': 'none',
+        'page_size': 65536,
+        'journal_mode': 'off',
+        'synchronous': 'off',
+        'cache_size': -256 * 1024,
+        'mmap_size': 0,
+        'temp_store': 'memory',
+    },
+    'durable': {
+        'auto_vacuum': 'incremental',
+        'page_size': 4096,
+        'journal_mode': 'wal',
+        'synchronous': 'full',
+        'cache_size': -16 * 1024,
+        'mmap_size': 0,
+        'temp_store': 'default',
+    },
+}
+
+
+def resolve_pragmas(profile: Optional[str], overrides: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if profile is not None and profile not in PROFILES:
+        raise InvalidTuning(f'Unknown tuning profile {profile}')
+    settings = dict(PROFILES[profile]) if profile is not None else {}
+    for name, value in (overrides or {}).items():
+        if name not in PRAGMAS:
+            raise InvalidTuning(f'Unsupported setting {name}')
+        # Pragma values can't be bound as parameters
+        if not isinstance(value, int) and not (isinstance(value, str) and value.isalnum()):
+            raise InvalidTuning(f'Invalid value {value!r} for setting {name}')
+        settings[name] = value
+    return {
+        name: settings[name]
+        for name in PRAGMAS
+        if name in settings
+    }
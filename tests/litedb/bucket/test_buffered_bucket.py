@@ -0,0 +1,168 @@
+import sqlite3
+import time
+from os import path
+
+import pytest
+
+from litedb import Repository, Field, InvalidField, BufferIsClosed
+
+
+def test_coalesce_writes(stateless_repo, bucket):
+    # given
+    buffered = stateless_repo.buffered_bucket(bucket.name, max_delay=60)
+    # when
+    buffered.save({'id': 1, 'name': 'Alice', 'age': 30})
+    buffered.save({'id': 1, 'name': 'Alice', 'age': 31})
+    buffered.save({'id': 2, 'name': 'Bob', 'age': 25})
+    # then
+    assert buffered.pending == 2
+    assert bucket.get(1) is None
+    assert buffered.get(1) == {'id': 1, 'name': 'Alice', 'age': 31}
+
+
+def test_flush(stateless_repo, bucket):
+    # given
+    buffered = stateless_repo.buffered_bucket(bucket.name, max_delay=60)
+    bucket.save({'id': 3, 'name': 'Charlie', 'age': 35})
+    buffered.save_all([
+        {'id': 1, 'name': 'Alice', 'age': 30},
+        {'id': 2, 'name': 'Bob', 'age': 25},
+    ])
+    buffered.delete(3)
+    assert buffered.get(3) is None
+    # when
+    buffered.flush()
+    # then
+    assert buffered.pending == 0
+    assert bucket.count() == 2
+    assert bucket.get(2) == {'id': 2, 'name': 'Bob', 'age': 25}
+    assert bucket.get(3) is None
+
+
+def test_size_threshold(stateless_repo, bucket):
+    # given
+    buffered = stateless_repo.buffered_bucket(bucket.name, max_items=10, max_delay=60)
+    # when
+    buffered.save_all({'id': i, 'name': f'name{i}', 'age': i} for i in range(10))
+    # then
+    deadline = time.time() + 5
+    while bucket.count() < 10 and time.time() < deadline:
+        time.sleep(0.01)
+    assert bucket.count() == 10
+
+
+def test_time_threshold(stateless_repo, bucket):
+    # given
+    buffered = stateless_repo.buffered_bucket(bucket.name, max_delay=0.05)
+    # when
+    buffered.save({'id': 1, 'name': 'Alice', 'age': 30})
+    # then
+    deadline = time.time() + 5
+    while bucket.count() < 1 and time.time() < deadline:
+        time.sleep(0.01)
+    assert bucket.get(1) == {'id': 1, 'name': 'Alice', 'age': 30}
+
+
+def test_flush_on_close(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    repo = Repository(file_path)
+    repo.create_bucket('test', [Field('id', is_key=True), Field('name')])
+    buffered = repo.buffered_bucket('test', max_delay=60)
+    buffered.save({'id': 1, 'name': 'Alice'})
+    # when
+    repo.close()
+    # then
+    with Repository(file_path) as new_repo:
+        assert new_repo.bucket('test').get(1) == {'id': 1, 'name': 'Alice'}
+
+
+def test_unstorable_value_rejected(stateless_repo, bucket):
+    # given
+    buffered = stateless_repo.buffered_bucket(bucket.name, max_delay=60)
+    # when
+    with pytest.raises(InvalidField):
+        buffered.save_all([{'id': 1, 'name': 'Alice', 'age': 30}, {'id': 2, 'name': {'first': 'Bob'}, 'age': 25}])
+    buffered.save({'id': 3, 'name': 'Charlie', 'age': 35})
+    buffered.flush()
+    # then
+    assert buffered.pending == 0
+    assert [item['id'] for item in bucket.all()] == [3]
+
+
+class Broken:
+    pass
+
+
+@pytest.fixture
+def broken_adapter():
+    def adapt(value):
+        raise ValueError('broken')
+
+    sqlite3.register_adapter(Broken, adapt)
+    yield
+    del sqlite3.adapters[(Broken, sqlite3.PrepareProtocol)]
+
+
+def test_failed_item_not_blocking_others(stateless_repo, bucket, broken_adapter):
+    # given
+    buffered = stateless_repo.buffered_bucket(bucket.name, max_delay=60)
+    buffered.save({'id': 1, 'name': Broken(), 'age': 30})
+    buffered.save({'id': 2, 'name': 'Bob', 'age': 25})
+    # when
+    with pytest.raises(ValueError):
+        buffered.flush()
+    # then
+    assert buffered.pending == 0
+    assert [item['id'] for item in bucket.all()] == [2]
+
+
+def test_saved_items_copied(stateless_repo, bucket):
+    # given
+    buffered = stateless_repo.buffered_bucket(bucket.name, max_delay=60)
+    item = {'id': 5, 'name': 'Eve', 'age': 40}
+    buffered.save(item)
+    # when
+    item['name'] = 'MUTATED'
+    buffered.flush()
+    # then
+    assert bucket.get(5) == {'id': 5, 'name': 'Eve', 'age': 40}
+
+
+def test_close_flushes_every_buffer(tempdir, broken_adapter):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    repo = Repository(file_path)
+    for name in ('first', 'second'):
+        repo.create_bucket(name, [Field('id', is_key=True), Field('name')])
+    repo.buffered_bucket('first', max_delay=60).save_all([{'id': 1, 'name': Broken()}, {'id': 2, 'name': 'Bob'}])
+    repo.buffered_bucket('second', max_delay=60).save({'id': 3, 'name': 'Charlie'})
+    # when
+    with pytest.raises(ValueError):
+        repo.close()
+    # then
+    with Repository(file_path) as new_repo:
+        assert [item['id'] for item in new_repo.bucket('first').all()] == [2]
+        assert [item['id'] for item in new_repo.bucket('second').all()] == [3]
+
+
+def test_closed_buffer_rejects_writes(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    repo = Repository(file_path)
+    repo.create_bucket('test', [Field('id', is_key=True), Field('name')])
+    buffered = repo.buffered_bucket('test', max_delay=60)
+    buffered.save({'id': 1, 'name': 'Alice'})
+    # when
+    repo.create_bucket('test', [Field('id', is_key=True), Field('name'), Field('age')], update_if_needed=True)
+    # then
+    with pytest.raises(BufferIsClosed):
+        buffered.save({'id': 2, 'name': 'Bob'})
+    with pytest.raises(BufferIsClosed):
+        buffered.delete(1)
+    assert repo.bucket('test').get(1) == {'id': 1, 'name': 'Alice', 'age': None}
+    # and when closed with the repository
+    buffered = repo.buffered_bucket('test', max_delay=60)
+    repo.close()
+    with pytest.raises(BufferIsClosed):
+        buffered.save({'id': 3, 'name': 'Charlie'})
@@ -0,0 +1,115 @@
+from os import path
+
+import pytest
+
+from litedb import Repository, Field, InvalidField, where
+
+SCHEMA = [
+    Field('id', is_key=True),
+    Field('title'),
+    Field('body', compression='zlib', compression_threshold=64),
+    Field('data', compression='lzma', compression_threshold=64),
+]
+
+
+@pytest.fixture
+def documents(stateless_repo):
+    yield stateless_repo.create_bucket('documents', SCHEMA)
+
+
+def stored(bucket, key, field):
+    cur = bucket._db_.conn.execute(f'select {field} from {bucket.name} where id=?', (key,))
+    return cur.fetchone()[0]
+
+
+def test_compressed_values(documents):
+    # given
+    item = {'id': 1, 'title': 'big', 'body': 'lorem ipsum ' * 100, 'data': b'\x01\x02' * 100}
+    # when
+    documents.save(item)
+    # then
+    assert documents.get(1) == item
+    assert list(documents.all()) == [item]
+    assert list(documents.filter(where('title').equal_to('big'))) == [item]
+    assert len(stored(documents, 1, 'body')) < 100
+    assert len(stored(documents, 1, 'data')) < 100
+
+
+def test_small_values_not_compressed(documents):
+    # given
+    item = {'id': 1, 'title': 'small', 'body': 'short', 'data': b'\x00raw'}
+    # when
+    documents.save(item)
+    # then
+    assert documents.get(1) == item
+    assert stored(documents, 1, 'body') == 'short'
+
+
+def test_read_fields(documents):
+    # given
+    documents.save({'id': 1, 'title': 'big', 'body': 'lorem ipsum ' * 100, 'data': None})
+    # when
+    item = documents.get(1, fields=['id', 'title'])
+    items = list(documents.all(fields=['title']))
+    # then
+    assert item == {'id': 1, 'title': 'big'}
+    assert items == [{'title': 'big'}]
+
+
+@pytest.mark.parametrize('query', [
+    where('body').equal_to('lorem ipsum ' * 100),
+    where('title').equal_to('big') & where('body').starts_with('lorem'),
+    ~where('data').is_null(),
+])
+def test_compressed_fields_not_queried(stateless_repo, documents, query):
+    # given
+    documents.save({'id': 1, 'title': 'big', 'body': 'lorem ipsum ' * 100, 'data': None})
+    replica = stateless_repo.replica(documents.name)
+    # then
+    with pytest.raises(InvalidField):
+        list(documents.filter(query))
+    with pytest.raises(InvalidField):
+        documents.count(query)
+    with pytest.raises(InvalidField):
+        documents.update_all(query, {'title': 'small'})
+    with pytest.raises(InvalidField):
+        replica.filter(query)
+
+
+def test_compression_persisted(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path) as repo:
+        repo.create_bucket('documents', SCHEMA).save({'id': 1, 'title': 'a', 'body': 'b' * 100, 'data': None})
+    # when
+    with Repository(file_path) as repo:
+        bucket = repo.bucket('documents')
+        # then
+        assert bucket.schema == SCHEMA
+        assert bucket.get(1)['body'] == 'b' * 100
+
+
+def test_compress_existing_field(stateless_repo):
+    # given
+    bucket = stateless_repo.create_bucket('documents', [Field('id', is_key=True), Field('body')])
+    bucket.save_all([{'id': 1, 'body': 'x' * 1000}, {'id': 2, 'body': b'\x01' * 1000}])
+    # when
+    bucket = stateless_repo.create_bucket(
+        'documents',
+        [Field('id', is_key=True), Field('body', compression='zlib')],
+        update_if_needed=True,
+    )
+    # then
+    assert bucket.get(1) == {'id': 1, 'body': 'x' * 1000}
+    assert bucket.get(2) == {'id': 2, 'body': b'\x01' * 1000}
+    assert len(stored(bucket, 1, 'body')) < 1000
+
+
+@pytest.mark.parametrize('field', [
+    Field('body', indexed=True, compression='zlib'),
+    Field('body', compression='gzip'),
+])
+def test_invalid_compression(stateless_repo, field):
+    # when
+    with pytest.raises(InvalidField):
+        stateless_repo.create_bucket('documents', [Field('id', is_key=True), field])
@@ -0,0 +1,105 @@
+from os import path
+
+import pytest
+
+from litedb import Repository, Field, BucketNotExpiring, BucketSchemaChanged, where
+from litedb.storage import sql_sweep
+
+SCHEMA = [Field('id', is_key=True), Field('value')]
+
+
+@pytest.fixture
+def sessions(stateless_repo):
+    bucket = stateless_repo.create_bucket('sessions', SCHEMA, ttl=3600)
+    bucket.save_all([{'id': 1, 'value': 'a'}, {'id': 2, 'value': 'b'}])
+    bucket.save({'id': 3, 'value': 'c'}, ttl=-1)
+    yield bucket
+
+
+def test_expired_items_hidden(sessions):
+    # then
+    assert sessions.get(3) is None
+    assert sessions.get(1) == {'id': 1, 'value': 'a'}
+    assert [item['id'] for item in sessions.all()] == [1, 2]
+    assert [item['id'] for item in sessions.filter(where('value').is_not_null())] == [1, 2]
+    assert sessions.count() == 2
+
+
+def test_save_over_expired_item(sessions):
+    # when
+    sessions.save({'id': 3, 'value': 'd'}, update_if_exists=False)
+    # then
+    assert sessions.get(3) == {'id': 3, 'value': 'd'}
+
+
+def test_sweep(stateless_repo, sessions):
+    # given
+    sessions.save_all(({'id': i, 'value': i} for i in range(10, 20)), ttl=-1)
+    # when
+    first = sessions.sweep(max_rows=5)
+    rest = stateless_repo.sweep()
+    # then
+    assert first == 5
+    assert rest == 6
+    assert stateless_repo._db_.conn.execute('select count(*) from sessions').fetchone()[0] == 2
+
+
+def test_sweep_uses_index(stateless_repo, sessions):
+    # when
+    plan = stateless_repo._db_.conn.execute(f'explain query plan {sql_sweep("sessions")}', {'now': 0, 'limit': 1})
+    # then
+    details = [row[3] for row in plan.fetchall()]
+    assert any('idx_sessions_litedb_expires_at' in detail for detail in details)
+    assert not any('TEMP B-TREE' in detail for detail in details)
+
+
+def test_maintenance_sweeps(stateless_repo, sessions):
+    # when
+    report = stateless_repo.maintain(budget_ms=1000)
+    # then
+    assert report[0].name == 'expire'
+    assert report[0].detail == 'deleted 1 expired items'
+
+
+def test_not_expiring(bucket):
+    with pytest.raises(BucketNotExpiring):
+        bucket.save({'id': 1}, ttl=10)
+    with pytest.raises(BucketNotExpiring):
+        bucket.sweep()
+
+
+def test_enable_ttl(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path) as repo:
+        repo.create_bucket('cache', SCHEMA).save({'id': 1, 'value': 'old'})
+        with pytest.raises(BucketSchemaChanged):
+            repo.create_bucket('cache', SCHEMA, ttl=60)
+        # when
+        repo.create_bucket('cache', SCHEMA, update_if_needed=True, ttl=60)
+    # then
+    with Repository(file_path) as repo:
+        bucket = repo.bucket('cache')
+        assert bucket.ttl == 60
+        bucket.save({'id': 2, 'value': 'new'}, ttl=-1)
+        assert [item['id'] for item in bucket.all()] == [1]
+
+
+def test_disable_ttl(stateless_repo, sessions):
+    # when
+    bucket = stateless_repo.create_bucket('sessions', SCHEMA, update_if_needed=True)
+    # then
+    assert bucket.ttl is None
+    assert [item['id'] for item in bucket.all()] == [1, 2]
+    assert bucket.get(3) is None
+
+
+def test_disable_and_enable_ttl(stateless_repo, sessions):
+    # given
+    stateless_repo.create_bucket('sessions', SCHEMA, update_if_needed=True).save({'id': 1, 'value': 'again'})
+    # when
+    bucket = stateless_repo.create_bucket('sessions', SCHEMA, update_if_needed=True, ttl=3600)
+    # then
+    cur = stateless_repo._db_.conn.execute('select count(*) from sessions where litedb_expires_at is not null')
+    assert cur.fetchone()[0] == 0
+    assert [item['id'] for item in bucket.all()] == [1, 2]
@@ -0,0 +1,167 @@
+import sqlite3
+import time
+from os import path
+
+import pytest
+
+from litedb import Repository, Field, InvalidPartition, BucketNotFound, where, asc, desc
+
+DAY = 86400
+SCHEMA = [Field('id', is_key=True), Field('ts'), Field('kind', indexed=True)]
+EVENTS = [
+    {'id': 1, 'ts': 0 * DAY + 10, 'kind': 'a'},
+    {'id': 2, 'ts': 1 * DAY + 10, 'kind': 'b'},
+    {'id': 3, 'ts': 1 * DAY + 20, 'kind': 'a'},
+    {'id': 4, 'ts': 2 * DAY + 10, 'kind': 'b'},
+]
+
+
+@pytest.fixture
+def events(stateless_repo):
+    bucket = stateless_repo.create_bucket('events', SCHEMA, partition_by='ts', partition_period=DAY)
+    bucket.save_all(EVENTS)
+    yield bucket
+
+
+def scanned(bucket, query):
+    details = ' '.join(bucket.explain(query))
+    return [name for name in bucket.partitions if name in details]
+
+
+def test_partitions(stateless_repo, events):
+    # then
+    assert events.partitions == ['events__p0', 'events__p1', 'events__p2']
+    assert stateless_repo.buckets == {'events'}
+    assert events.count() == 4
+    assert list(events.all()) == EVENTS
+
+
+def test_get_and_delete(events):
+    # when
+    events.delete(2)
+    # then
+    assert events.get(3) == EVENTS[2]
+    assert events.get(2) is None
+    assert events.get(4, fields=['kind']) == {'kind': 'b'}
+
+
+def test_save_result(events):
+    # when
+    result = events.save_all([
+        {'id': 1, 'ts': 10, 'kind': 'a'},
+        {'id': 4, 'ts': 2 * DAY + 10, 'kind': 'c'},
+        {'id': 5, 'ts': 3 * DAY, 'kind': 'a'},
+    ])
+    # then
+    assert result == (1, 1, 1)
+    assert len(events.partitions) == 4
+
+
+def test_save_with_new_time(events):
+    # when
+    result = events.save({'id': 1, 'ts': 2 * DAY + 20, 'kind': 'a'})
+    # then
+    assert result == (0, 1, 0)
+    assert events.count() == 4
+    assert events.get(1) == {'id': 1, 'ts': 2 * DAY + 20, 'kind': 'a'}
+    assert [item['id'] for item in events.filter(where('ts').less_than(DAY))] == []
+    with pytest.raises(sqlite3.IntegrityError):
+        events.save({'id': 2, 'ts': 10, 'kind': 'b'}, update_if_exists=False)
+    assert events.get(2) == {'id': 2, 'ts': 1 * DAY + 10, 'kind': 'b'}
+
+
+def test_prune_partitions(events):
+    # given
+    query = where('ts').between(DAY, 2 * DAY - 1) & where('kind').equal_to('a')
+    # when
+    items = list(events.filter(query))
+    # then
+    assert items == [EVENTS[2]]
+    assert events.count(query) == 1
+    assert scanned(events, query) == ['events__p1']
+    assert scanned(events, where('ts').greater_or_equal_to(2 * DAY)) == ['events__p2']
+    assert scanned(events, where('ts').less_than(-10)) == []
+    assert scanned(events, where('ts').exists_in([5, 2 * DAY + 5])) == ['events__p0', 'events__p2']
+
+
+def test_sort_across_partitions(events):
+    # when
+    items = list(events.filter(where('ts').greater_than(0), desc('kind') & asc('ts'), fields=['id']))
+    # then
+    assert items == [{'id': 2}, {'id': 4}, {'id': 1}, {'id': 3}]
+
+
+def test_drop_partitions(events):
+    # when
+    dropped = events.drop_partitions(before=2 * DAY)
+    # then
+    assert dropped == 2
+    assert events.partitions == ['events__p2']
+    assert [item['id'] for item in events.all()] == [4]
+
+
+def test_retention(stateless_repo):
+    # given
+    now = time.time()
+    events = stateless_repo.create_bucket('events', SCHEMA, partition_by='ts', partition_period=DAY, retention=DAY)
+    events.save_all([
+        {'id': 1, 'ts': now - 3 * DAY, 'kind': 'a'},
+        {'id': 2, 'ts': now, 'kind': 'a'},
+    ])
+    # when
+    report = stateless_repo.maintain(budget_ms=1000)
+    # then
+    assert 'dropped 1 partitions' in [step.detail for step in report]
+    assert [item['id'] for item in events.all()] == [2]
+
+
+def test_partitioning_persisted(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path) as repo:
+        repo.create_bucket('events', SCHEMA, partition_by='ts', partition_period=DAY).save_all(EVENTS)
+    # when
+    with Repository(file_path) as repo:
+        events = repo.bucket('events')
+        # then
+        assert events.partition_by == 'ts'
+        assert events.count(where('ts').less_than(DAY)) == 1
+        repo.drop_bucket('events')
+        assert repo._db_.partitions('events') == []
+
+
+def test_invalid_partitioning(stateless_repo, events):
+    # then
+    with pytest.raises(InvalidPartition):
+        stateless_repo.create_bucket('other', SCHEMA, partition_by='id')
+    with pytest.raises(InvalidPartition):
+        stateless_repo.create_bucket('other', SCHEMA, partition_by='ts', ttl=60)
+    with pytest.raises(InvalidPartition):
+        stateless_repo.create_bucket('events', SCHEMA, partition_by='ts', partition_period=3600)
+    with pytest.raises(InvalidPartition):
+        events.save({'id': 9, 'ts': None, 'kind': 'a'})
+
+
+def test_partitions_are_not_buckets(stateless_repo, events):
+    # given
+    partition = events.partitions[0]
+    # when
+    stateless_repo.drop_bucket(partition)
+    # then
+    with pytest.raises(BucketNotFound):
+        stateless_repo.bucket(partition)
+    with pytest.raises(InvalidPartition):
+        stateless_repo.create_bucket(partition, SCHEMA)
+    assert events.count() == 4
+
+
+def test_partition_clashing_with_bucket(stateless_repo):
+    # given
+    stateless_repo.create_bucket('events__p0', SCHEMA)
+    events = stateless_repo.create_bucket('events', SCHEMA, partition_by='ts', partition_period=DAY)
+    # when
+    with pytest.raises(InvalidPartition):
+        events.save({'id': 1, 'ts': 10, 'kind': 'a'})
+    # then
+    assert events.count() == 0
+    assert stateless_repo.bucket('events__p0').count() == 0
@@ -0,0 +1,45 @@
+def test_save_all_counts(bucket):
+    # given
+    bucket.save_all([
+        {'id': 1, 'name': 'Alice', 'age': 30},
+        {'id': 2, 'name': 'Bob', 'age': 25},
+    ])
+    # when
+    result = bucket.save_all([
+        {'id': 1, 'name': 'Alice', 'age': 30},
+        {'id': 2, 'name': 'Bob', 'age': 26},
+        {'id': 3, 'name': 'Charlie', 'age': 35},
+    ])
+    # then
+    assert result == (1, 1, 1)
+    assert result.inserted == 1
+    assert bucket.get(2) == {'id': 2, 'name': 'Bob', 'age': 26}
+
+
+def test_unchanged_rows_not_written(bucket):
+    # given
+    bucket.save({'id': 1, 'name': 'Alice', 'age': 30})
+    changes = bucket._db_.conn.total_changes
+    # when
+    result = bucket.save({'id': 1, 'name': 'Alice', 'age': 30})
+    # then
+    assert result == (0, 0, 1)
+    assert bucket._db_.conn.total_changes == changes
+
+
+def test_repeated_key(bucket):
+    # when
+    result = bucket.save_all([
+        {'id': 1, 'name': 'Alice', 'age': 30},
+        {'id': 1, 'name': 'Alice', 'age': 31},
+        {'id': 1, 'name': 'Alice', 'age': 31},
+    ])
+    # then
+    assert result == (1, 1, 1)
+
+
+def test_insert_counts(bucket):
+    # when
+    result = bucket.save_all([{'id': 1, 'name': 'Alice', 'age': 30}], update_if_exists=False)
+    # then
+    assert result == (1, 0, 0)
@@ -0,0 +1,152 @@
+import threading
+
+import pytest
+
+from litedb import Repository, Field, InvalidField, InvalidPartition, where, add, maximum, minimum
+
+ITEMS = [
+    {'id': 1, 'name': 'Alice', 'age': 30},
+    {'id': 2, 'name': 'Bob', 'age': 25},
+    {'id': 3, 'name': 'Charlie', 'age': None},
+]
+
+
+@pytest.fixture
+def people(bucket):
+    bucket.save_all(ITEMS)
+    yield bucket
+
+
+def test_increment(people):
+    # when
+    age = people.increment(1, 'age', 5)
+    # then
+    assert age == 35
+    assert people.get(1) == {'id': 1, 'name': 'Alice', 'age': 35}
+
+
+def test_increment_null_and_missing(people):
+    # when
+    age = people.increment(3, 'age')
+    missing = people.increment(4, 'age')
+    # then
+    assert age == 1
+    assert missing is None
+    assert people.get(4) is None
+
+
+def test_update_expressions(people):
+    # when
+    item = people.update(1, {'name': 'Alicia', 'age': maximum(40)}, returning=True)
+    people.update(2, {'age': maximum(20)})
+    people.update(3, {'age': minimum(18)})
+    # then
+    assert item == {'id': 1, 'name': 'Alicia', 'age': 40}
+    assert people.get(2)['age'] == 25
+    assert people.get(3)['age'] == 18
+
+
+def test_update_all(people):
+    # when
+    count = people.update_all(where('age').greater_than(20), {'age': add(1)})
+    items = people.update_all(where('name').equal_to('Bob'), {'name': 'Robert'}, returning=True)
+    # then
+    assert count == 2
+    assert items == [{'id': 2, 'name': 'Robert', 'age': 26}]
+    assert [item['age'] for item in people.all()] == [31, 26, None]
+
+
+def test_increment_all(people):
+    # when
+    count = people.increment_all('age', {1: 1, 2: -5, 4: 10})
+    # then
+    assert count == 2
+    assert [item['age'] for item in people.all()] == [31, 20, None]
+
+
+def test_invalid_changes(people):
+    # then
+    with pytest.raises(InvalidField):
+        people.update(1, {'id': 2})
+    with pytest.raises(InvalidField):
+        people.update(1, {'email': 'alice@example.com'})
+
+
+def test_concurrent_increments(people):
+    # given
+    def increment():
+        for _ in range(100):
+            people.increment(1, 'age')
+
+    threads = [threading.Thread(target=increment) for _ in range(4)]
+    # when
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # then
+    assert people.get(1)['age'] == 430
+
+
+def test_cached_results_invalidated():
+    # given
+    with Repository(cache_size=1_000_000) as repo:
+        bucket = repo.create_bucket('people', [Field('id', is_key=True), Field('age')])
+        bucket.save_all([{'id': 1, 'age': 30}])
+        assert bucket.count(where('age').greater_than(30)) == 0
+        # when
+        bucket.increment(1, 'age')
+        # then
+        assert bucket.count(where('age').greater_than(30)) == 1
+
+
+def test_buffered_writes_flushed(stateless_repo, people):
+    # given
+    buffered = stateless_repo.buffered_bucket(people.name, max_delay=60)
+    buffered.save({'id': 1, 'name': 'Alice', 'age': 50})
+    # when
+    age = buffered.increment(1, 'age')
+    # then
+    assert age == 51
+    buffered.close()
+
+
+def test_replica_notified(stateless_repo, people):
+    # given
+    replica = stateless_repo.replica(people.name)
+    # when
+    count = people.update_all(where('age').greater_than(20), {'age': add(1)})
+    # then
+    assert count == 2
+    assert replica.get(1)['age'] == 31
+    assert [item['id'] for item in replica.filter(where('age').equal_to(26))] == [2]
+
+
+def test_compressed_field(stateless_repo):
+    # given
+    schema = [Field('id', is_key=True), Field('body', compression='zlib', compression_threshold=8)]
+    documents = stateless_repo.create_bucket('documents', schema)
+    documents.save({'id': 1, 'body': 'short'})
+    # when
+    item = documents.update(1, {'body': 'a' * 100}, returning=True)
+    # then
+    assert item == {'id': 1, 'body': 'a' * 100}
+    assert documents.get(1) == {'id': 1, 'body': 'a' * 100}
+    with pytest.raises(InvalidField):
+        documents.update(1, {'body': add('b')})
+
+
+def test_partitioned_bucket(stateless_repo):
+    # given
+    schema = [Field('id', is_key=True), Field('ts'), Field('views')]
+    events = stateless_repo.create_bucket('events', schema, partition_by='ts', partition_period=10)
+    events.save_all([{'id': 1, 'ts': 5, 'views': 0}, {'id': 2, 'ts': 15, 'views': 0}])
+    # when
+    views = events.increment(2, 'views', 3)
+    count = events.update_all(where('ts').less_than(9), {'views': add(1)})
+    # then
+    assert views == 3
+    assert count == 1
+    assert [item['views'] for item in events.all()] == [1, 3]
+    with pytest.raises(InvalidPartition):
+        events.update(1, {'ts': 25})
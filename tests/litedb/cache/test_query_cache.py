@@ -0,0 +1,64 @@
+from os import path
+
+from litedb import Repository, Field, where, asc
+
+
+def test_cache_hit(tempdir):
+    # given
+    with Repository(path.join(tempdir, 'test.ldb'), cache_size=1024 * 1024) as repo:
+        bucket = repo.create_bucket('test', [Field('id', is_key=True), Field('age')])
+        bucket.save_all([{'id': 1, 'age': 30}, {'id': 2, 'age': 25}])
+        # when
+        first = list(bucket.filter(where('age').greater_than(20), asc('age')))
+        second = list(bucket.filter(where('age').greater_than(20), asc('age')))
+        # then
+        assert first == second == [{'id': 2, 'age': 25}, {'id': 1, 'age': 30}]
+        assert bucket.count() == bucket.count() == 2
+        stats = repo.cache.stats()
+        assert stats.hits == 2
+        assert stats.misses == 2
+        assert stats.entries == 2
+
+
+def test_invalidated_by_write():
+    # given
+    with Repository(cache_size=1024 * 1024) as repo:
+        bucket = repo.create_bucket('test', [Field('id', is_key=True), Field('age')])
+        bucket.save({'id': 1, 'age': 30})
+        assert bucket.count() == 1
+        # when
+        bucket.save({'id': 2, 'age': 25})
+        # then
+        assert bucket.count() == 2
+        bucket.delete(1)
+        assert list(bucket.filter(where('age').greater_than(0))) == [{'id': 2, 'age': 25}]
+        assert repo.cache.stats().hits == 0
+
+
+def test_invalidated_by_other_connection(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path, cache_size=1024 * 1024) as repo:
+        bucket = repo.create_bucket('test', [Field('id', is_key=True), Field('age')])
+        bucket.save({'id': 1, 'age': 30})
+        assert bucket.count() == 1
+        # when
+        with Repository(file_path) as other:
+            other.bucket('test').save({'id': 2, 'age': 25})
+        # then
+        assert bucket.count() == 2
+        assert repo.cache.stats().invalidations == 1
+
+
+def test_eviction():
+    # given
+    with Repository(cache_size=2048) as repo:
+        bucket = repo.create_bucket('test', [Field('id', is_key=True), Field('age')])
+        bucket.save_all({'id': i, 'age': i} for i in range(10))
+        # when
+        for i in range(10):
+            list(bucket.filter(where('age').greater_or_equal_to(i)))
+        # then
+        stats = repo.cache.stats()
+        assert stats.evictions > 0
+        assert stats.size <= 2048
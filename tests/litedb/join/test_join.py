@@ -0,0 +1,90 @@
+import pytest
+
+from litedb import Field, InvalidJoin, Repository, join, where, asc, desc
+
+
+@pytest.fixture
+def buckets(stateless_repo):
+    users = stateless_repo.create_bucket('users', [Field('id', is_key=True), Field('name')])
+    orders = stateless_repo.create_bucket('orders', [
+        Field('id', is_key=True),
+        Field('user_id', indexed=True),
+        Field('total'),
+    ])
+    users.save_all([{'id': 1, 'name': 'Alice'}, {'id': 2, 'name': 'Bob'}, {'id': 3, 'name': 'Carol'}])
+    orders.save_all([
+        {'id': 10, 'user_id': 1, 'total': 5},
+        {'id': 11, 'user_id': 1, 'total': 50},
+        {'id': 12, 'user_id': 2, 'total': 20},
+    ])
+    yield users, orders
+
+
+def test_nested(buckets):
+    # given
+    users, orders = buckets
+    # when
+    rows = list(join(orders, users, on=('user_id', 'id'), sort=asc('orders.id')))
+    # then
+    assert rows[0] == {
+        'orders': {'id': 10, 'user_id': 1, 'total': 5},
+        'users': {'id': 1, 'name': 'Alice'},
+    }
+    assert [row['users']['name'] for row in rows] == ['Alice', 'Alice', 'Bob']
+
+
+def test_prefixed_with_queries(buckets):
+    # given
+    users, orders = buckets
+    # when
+    rows = join(
+        orders,
+        users,
+        on=('user_id', 'id'),
+        left_query=where('total').greater_than(10),
+        right_query=where('name').starts_with('A'),
+        sort=desc('orders.total'),
+        nested=False,
+    )
+    # then
+    assert list(rows) == [{'orders.id': 11, 'orders.user_id': 1, 'orders.total': 50, 'users.id': 1, 'users.name': 'Alice'}]
+
+
+def test_outer(buckets):
+    # given
+    users, orders = buckets
+    # when
+    rows = list(join(users, orders, on=('id', 'user_id'), outer=True, sort=asc('users.id') & asc('orders.id')))
+    # then
+    assert [(row['users']['id'], row['orders'] and row['orders']['id']) for row in rows] == [
+        (1, 10), (1, 11), (2, 12), (3, None),
+    ]
+
+
+def test_explain_uses_index(buckets):
+    # given
+    users, orders = buckets
+    # when
+    plan = join(users, orders, on=('id', 'user_id')).explain()
+    # then
+    assert any(step.startswith('SEARCH') and 'USING' in step for step in plan)
+
+
+def test_self_join(buckets):
+    # given
+    users, _ = buckets
+    # then
+    with pytest.raises(InvalidJoin):
+        join(users, users, on=('id', 'id'))
+    rows = join(users, users, on=('id', 'id'), aliases=('a', 'b'))
+    assert len(list(rows)) == 3
+
+
+def test_other_repository(buckets):
+    # given
+    users, _ = buckets
+    with Repository() as other:
+        accounts = other.create_bucket('accounts', [Field('id', is_key=True)])
+        # then
+        with pytest.raises(InvalidJoin):
+            join(users, accounts, on=('id', 'id'))
@@ -0,0 +1,67 @@
+import pytest
+
+from litedb import where, asc
+from litedb.storage import prefix_upper_bound
+
+
+@pytest.fixture
+def people(bucket):
+    bucket.save_all([
+        {'id': 1, 'name': 'Alice', 'age': 30},
+        {'id': 2, 'name': 'Albert', 'age': 25},
+        {'id': 3, 'name': 'Bob', 'age': None},
+        {'id': 4, 'name': 'alfred', 'age': 40},
+    ])
+    yield bucket
+
+
+def keys(items):
+    return [item['id'] for item in items]
+
+
+def test_between(people):
+    # when
+    result = people.filter(where('age').between(25, 30), asc('id'))
+    # then
+    assert keys(result) == [1, 2]
+
+
+def test_starts_with(people):
+    # when
+    result = people.filter(where('name').starts_with('Al'), asc('id'))
+    # then
+    assert keys(result) == [1, 2]
+
+
+def test_starts_with_uses_index(people):
+    # when
+    plan = people.explain(where('age').starts_with('3'))
+    # then
+    assert any('USING INDEX idx_test_bucket_age' in step for step in plan)
+
+
+def test_is_null(people):
+    # then
+    assert keys(people.filter(where('age').is_null())) == [3]
+    assert keys(people.filter(where('age').is_not_null(), asc('id'))) == [1, 2, 4]
+
+
+def test_negation(people):
+    # when
+    result = people.filter(~where('name').starts_with('Al') & where('age').is_not_null())
+    # then
+    assert keys(result) == [4]
+
+
+def test_large_exists_in(people):
+    # when
+    result = people.filter(where('id').exists_in(list(range(2, 1000))), asc('id'))
+    # then
+    assert keys(result) == [2, 3, 4]
+    assert 'json_each' in ' '.join(people.explain(where('id').exists_in(list(range(1000)))))
+
+
+def test_prefix_upper_bound():
+    assert prefix_upper_bound('ab') == 'ac'
+    assert prefix_upper_bound('a\U0010FFFF') == 'b'
+    assert prefix_upper_bound('') is None
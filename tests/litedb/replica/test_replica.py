@@ -0,0 +1,124 @@
+from os import path
+
+import pytest
+
+from litedb import Repository, Field, ReplicaIsClosed, where, asc, desc
+
+ITEMS = [
+    {'id': 1, 'name': 'Alice', 'age': 30},
+    {'id': 2, 'name': 'Bob', 'age': 25},
+    {'id': 3, 'name': 'Charlie', 'age': None},
+    {'id': 4, 'name': None, 'age': 'unknown'},
+    {'id': 5, 'name': 'Alfred', 'age': 25.5},
+    {'id': 6, 'name': 'Al', 'age': 41},
+]
+
+QUERIES = [
+    where('age').equal_to(25),
+    where('age').not_equal_to(25),
+    where('age').less_than(30),
+    where('age').less_or_equal_to(30),
+    where('age').greater_than(30),
+    where('age').greater_or_equal_to('a'),
+    where('age').between(25, 30),
+    where('age').exists_in([25, 41, None]),
+    where('age').is_null(),
+    where('age').is_not_null(),
+    where('age').equal_to(None),
+    where('name').starts_with('Al'),
+    where('name').not_equal_to('Bob'),
+    where('id').exists_in([1, 3, 7]),
+    ~where('age').equal_to(25),
+    ~where('name').exists_in(['Bob', None]),
+    where('age').greater_than(20) & where('name').starts_with('Al'),
+    where('age').less_than(26) | where('name').equal_to('Charlie'),
+    where('age').is_null() | ~where('name').is_null(),
+]
+
+
+@pytest.fixture
+def replica(stateless_repo, bucket):
+    bucket.save_all(ITEMS)
+    yield stateless_repo.replica(bucket.name)
+
+
+@pytest.mark.parametrize('query', QUERIES, ids=str)
+def test_same_results_as_bucket(bucket, replica, query):
+    # when
+    items = replica.filter(query, asc('id'))
+    # then
+    assert items == list(bucket.filter(query, asc('id')))
+
+
+def test_get(replica):
+    # then
+    assert replica.get(1) == ITEMS[0]
+    assert replica[4] == ITEMS[3]
+    assert replica.get(7) is None
+    assert replica.get(1, fields=['name']) == {'name': 'Alice'}
+    assert len(replica) == 6
+
+
+def test_sort(bucket, replica):
+    # given
+    sort = desc('age') & asc('name')
+    # when
+    items = replica.filter(where('id').greater_than(0), sort)
+    # then
+    assert items == list(bucket.filter(where('id').greater_than(0), sort))
+
+
+def test_writes_applied(stateless_repo, bucket, replica):
+    # given
+    buffered = stateless_repo.buffered_bucket(bucket.name, max_delay=60)
+    # when
+    bucket.save({'id': 1, 'name': 'Alice', 'age': 31})
+    bucket.delete(2)
+    bucket.save({'id': 7, 'name': 'Dave', 'age': 25})
+    buffered.save({'id': 8, 'name': 'Eve', 'age': 25})
+    buffered.flush()
+    # then
+    assert replica.get(1)['age'] == 31
+    assert replica.get(2) is None
+    assert [item['id'] for item in replica.filter(where('age').equal_to(25), asc('id'))] == [7, 8]
+    assert replica.filter(where('age').equal_to(30)) == []
+    assert replica.count() == 7
+
+
+def test_external_changes(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    schema = [Field('id', is_key=True), Field('name')]
+    with Repository(file_path) as repo, Repository(file_path) as other:
+        repo.create_bucket('test', schema).save({'id': 1, 'name': 'Alice'})
+        replica = repo.replica('test', refresh_interval=0)
+        # when
+        other.bucket('test').save({'id': 2, 'name': 'Bob'})
+        # then
+        assert replica.get(2) == {'id': 2, 'name': 'Bob'}
+
+
+def test_closed_on_schema_change(stateless_repo, bucket, replica):
+    # when
+    stateless_repo.create_bucket(
+        bucket.name,
+        bucket.schema + [Field('email')],
+        update_if_needed=True,
+    )
+    # then
+    with pytest.raises(ReplicaIsClosed):
+        replica.get(1)
+    assert stateless_repo.replica(bucket.name).get(1) == ITEMS[0] | {'email': None}
+
+
+def test_expired_items_hidden(stateless_repo):
+    # given
+    sessions = stateless_repo.create_bucket('sessions', [Field('id', is_key=True), Field('user')], ttl=3600)
+    sessions.save_all([{'id': 1, 'user': 'a'}, {'id': 2, 'user': 'b'}])
+    replica = stateless_repo.replica('sessions')
+    # when
+    sessions.save({'id': 3, 'user': 'c'}, ttl=-1)
+    # then
+    assert replica.get(3) is None
+    assert replica.count() == 2
+    assert [item['id'] for item in replica.all()] == [1, 2]
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+from os import path
+
+import pytest
+
+from litedb import Repository, Field, InvalidSchemaChange, migration
+
+
+@pytest.fixture
+def people(stateful_repo):
+    bucket = stateful_repo.create_bucket('people', [Field('id', is_key=True), Field('name'), Field('age')])
+    bucket.save_all({'id': i, 'name': f'name{i}', 'age': i} for i in range(25))
+    yield bucket
+
+
+def write_during_batch(monkeypatch, write) -> list:
+    # Starts write on another connection while the first batch computes its values
+    encode = migration.encode
+    writers = []
+
+    def encode_and_write(field, value):
+        if not writers:
+            writer = threading.Thread(target=write)
+            writers.append(writer)
+            writer.start()
+            writer.join(0.5)
+        return encode(field, value)
+
+    monkeypatch.setattr(migration, 'encode', encode_and_write)
+    return writers
+
+
+def test_add_column_with_default(stateful_repo, people):
+    # when
+    bucket = stateful_repo.create_bucket(
+        'people',
+        [Field('id', is_key=True), Field('name'), Field('age'), Field('active', default=1)],
+        update_if_needed=True,
+    )
+    bucket.save({'id': 100, 'name': 'new', 'age': 1})
+    # then
+    assert bucket.get(0)['active'] == 1
+    assert bucket.get(100)['active'] == 1
+
+
+def test_backfill(stateful_repo, people):
+    # given
+    reports = []
+    # when
+    bucket = stateful_repo.create_bucket(
+        'people',
+        [Field('id', is_key=True), Field('name'), Field('age'), Field('adult', indexed=True)],
+        update_if_needed=True,
+        backfill={'adult': lambda item: item['age'] >= 18},
+        batch_size=10,
+        progress=reports.append,
+    )
+    # then
+    assert bucket.get(20)['adult'] == 1
+    assert bucket.get(5)['adult'] == 0
+    assert [(report.step, report.done) for report in reports] == [
+        ('backfill adult', 10),
+        ('backfill adult', 20),
+        ('backfill adult', 25),
+        ('index adult', 1),
+    ]
+    assert reports[-2].eta == 0
+    assert stateful_repo._db_.migration('people') is None
+
+
+def test_drop_column(stateful_repo, people):
+    # when
+    bucket = stateful_repo.create_bucket(
+        'people',
+        [Field('id', is_key=True), Field('name')],
+        update_if_needed=True,
+        batch_size=10,
+    )
+    # then
+    assert bucket.get(1) == {'id': 1, 'name': 'name1'}
+    cur = stateful_repo._db_.conn.execute('select count(*) from people where age is not null')
+    assert cur.fetchone()[0] == 0
+    # and when added back
+    bucket = stateful_repo.create_bucket(
+        'people',
+        [Field('id', is_key=True), Field('name'), Field('age', default=0)],
+        update_if_needed=True,
+    )
+    assert bucket.get(1) == {'id': 1, 'name': 'name1', 'age': 0}
+
+
+def test_resume(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    schema = [Field('id', is_key=True), Field('age'), Field('double')]
+
+    def crash(item):
+        if item['id'] == 15:
+            raise RuntimeError('crash')
+        return item['age'] * 2
+
+    with Repository(file_path) as repo:
+        bucket = repo.create_bucket('people', [Field('id', is_key=True), Field('age')])
+        bucket.save_all({'id': i, 'age': i} for i in range(25))
+        with pytest.raises(RuntimeError):
+            repo.create_bucket('people', schema, update_if_needed=True, backfill={'double': crash}, batch_size=10)
+    # when
+    with Repository(file_path) as repo:
+        assert repo.bucket('people').schema == [Field('id', is_key=True), Field('age')]
+        assert repo._db_.migration('people')['rowid'] == 10
+        with pytest.raises(InvalidSchemaChange):
+            repo.create_bucket('people', schema, update_if_needed=True)
+        bucket = repo.create_bucket(
+            'people',
+            schema,
+            update_if_needed=True,
+            backfill={'double': lambda item: item['age'] * 2},
+        )
+        # then
+        assert bucket.schema == schema
+        assert [item['double'] for item in bucket.all()] == [i * 2 for i in range(25)]
+
+
+def test_backfill_keeps_concurrent_writes(tempdir, monkeypatch):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+
+    def write():
+        # Another process already on the new schema
+        with sqlite3.connect(file_path, timeout=5) as conn:
+            conn.execute('update people set adult=1 where id=2')
+        conn.close()
+
+    with Repository(file_path) as repo:
+        repo.create_bucket('people', [Field('id', is_key=True), Field('age')]).save_all(
+            {'id': i, 'age': i} for i in range(25)
+        )
+        writers = write_during_batch(monkeypatch, write)
+        # when
+        bucket = repo.create_bucket(
+            'people',
+            [Field('id', is_key=True), Field('age'), Field('adult')],
+            update_if_needed=True,
+            backfill={'adult': lambda item: item['age'] >= 18},
+            batch_size=10,
+        )
+        writers[0].join()
+        # then
+        assert bucket.get(2)['adult'] == 1
+        assert bucket.get(20)['adult'] == 1
+
+
+def test_recode_keeps_concurrent_writes(tempdir, monkeypatch):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    schema = [Field('id', is_key=True), Field('body')]
+    with Repository(file_path) as repo, Repository(file_path) as other:
+        repo.create_bucket('documents', schema).save_all({'id': i, 'body': 'x' * 1000} for i in range(25))
+        writers = write_during_batch(
+            monkeypatch,
+            lambda: other.bucket('documents').save({'id': 2, 'body': 'new' * 500}),
+        )
+        # when
+        bucket = repo.create_bucket(
+            'documents',
+            [Field('id', is_key=True), Field('body', compression='zlib')],
+            update_if_needed=True,
+            batch_size=10,
+        )
+        writers[0].join()
+        # then
+        assert bucket.get(2) == {'id': 2, 'body': 'new' * 500}
+        assert bucket.get(3) == {'id': 3, 'body': 'x' * 1000}
@@ -0,0 +1,32 @@
+from os import path
+
+from litedb import Repository, Field
+
+
+def test_lazy_catalog(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path) as repo:
+        for i in range(10):
+            repo.create_bucket(f'tenant{i}', [Field('id', is_key=True), Field('name')], ttl=60 if i == 0 else None)
+    # when
+    with Repository(file_path) as repo:
+        # then
+        assert repo.schemas == {}
+        assert repo.buckets == {f'tenant{i}' for i in range(10)}
+        assert repo.schemas == {}
+        assert repo.bucket('tenant0').ttl == 60
+        assert repo.bucket('tenant1').ttl is None
+        assert set(repo.schemas.keys()) == {'tenant0', 'tenant1'}
+
+
+def test_bucket_created_by_other_connection(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path) as repo:
+        # when
+        with Repository(file_path) as other:
+            other.create_bucket('new', [Field('id', is_key=True)])
+        # then
+        assert repo.buckets == {'new'}
+        assert repo.bucket('new').schema == [Field('id', is_key=True)]
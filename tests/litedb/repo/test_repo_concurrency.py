@@ -0,0 +1,110 @@
+import multiprocessing
+import sqlite3
+import threading
+from os import path
+
+import pytest
+
+from litedb import Repository, Field
+
+WRITERS = 8
+BATCHES = 20
+BATCH_SIZE = 10
+
+
+def writer(file_path: str, worker: int):
+    with Repository(file_path, profile='write_heavy', busy_timeout=0.05, write_retries=100) as repo:
+        bucket = repo.bucket('events')
+        for batch in range(BATCHES):
+            bucket.save_all(
+                {'id': f'{worker}-{batch}-{i}', 'worker': worker}
+                for i in range(BATCH_SIZE)
+            )
+
+
+def test_concurrent_writers(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path, profile='write_heavy') as repo:
+        repo.create_bucket('events', [Field('id', is_key=True), Field('worker')])
+    context = multiprocessing.get_context('spawn')
+    # when
+    processes = [context.Process(target=writer, args=(file_path, worker)) for worker in range(WRITERS)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    # then
+    assert [process.exitcode for process in processes] == [0] * WRITERS
+    with Repository(file_path) as repo:
+        assert repo.bucket('events').count() == WRITERS * BATCHES * BATCH_SIZE
+
+
+def test_retry_stats(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path, busy_timeout=0, write_retries=2) as repo:
+        bucket = repo.create_bucket('events', [Field('id', is_key=True)])
+        other = sqlite3.connect(file_path)
+        other.execute('begin immediate')
+        # when
+        with pytest.raises(sqlite3.OperationalError):
+            bucket.save({'id': 1})
+        other.rollback()
+        bucket.save({'id': 2})
+        # then
+        stats = repo.lock_stats
+        assert stats.retries == 2
+        assert stats.failures == 1
+        # Creating the bucket and the last save
+        assert stats.transactions == 2
+        other.close()
+
+
+def test_create_bucket_retried(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path, busy_timeout=0, write_retries=2) as repo:
+        other = sqlite3.connect(file_path)
+        other.execute('begin immediate')
+        # when
+        with pytest.raises(sqlite3.OperationalError):
+            repo.create_bucket('events', [Field('id', is_key=True)])
+        other.rollback()
+        other.close()
+        # then
+        assert repo.lock_stats.retries == 2
+        assert repo.create_bucket('events', [Field('id', is_key=True)]).count() == 0
+
+
+def test_migration_retried(tempdir):
+    # given
+    file_path = path.join(tempdir, 'test.ldb')
+    with Repository(file_path, busy_timeout=0, write_retries=20) as repo:
+        repo.create_bucket('events', [Field('id', is_key=True)]).save_all({'id': i} for i in range(25))
+        other = sqlite3.connect(file_path, check_same_thread=False)
+        other.execute('begin immediate')
+        release = threading.Timer(0.05, other.rollback)
+        release.start()
+        # when
+        bucket = repo.create_bucket(
+            'events',
+            [Field('id', is_key=True), Field('double')],
+            update_if_needed=True,
+            backfill={'double': lambda item: item['id'] * 2},
+            batch_size=10,
+        )
+        release.join()
+        other.close()
+        # then
+        assert repo.lock_stats.retries > 0
+        assert repo.lock_stats.failures == 0
+        assert [item['double'] for item in bucket.all()] == [i * 2 for i in range(25)]
+
+
+def test_errors_not_counted_as_lock_failures(stateless_repo):
+    # when
+    with pytest.raises(sqlite3.OperationalError):
+        stateless_repo._db_.write('missing', lambda cur: cur.execute('delete from missing'))
+    # then
+    assert stateless_repo.lock_stats.failures == 0
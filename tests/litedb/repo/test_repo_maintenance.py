@@ -0,0 +1,78 @@
+import time
+from os import path
+
+import pytest
+
+from litedb import Repository, Field
+
+
+@pytest.fixture
+def tuned_repo(tempdir):
+    with Repository(path.join(tempdir, 'test.ldb'), profile='write_heavy') as repo:
+        repo.maintenance.analyze_after = 100
+        yield repo
+
+
+def fill(repo):
+    bucket = repo.create_bucket('test', [Field('id', is_key=True), Field('data'), Field('age', indexed=True)])
+    bucket.save_all({'id': i, 'data': 'x' * 500, 'age': i % 10} for i in range(1000))
+    return bucket
+
+
+def test_analyze_after_writes(tuned_repo):
+    # given
+    fill(tuned_repo)
+    # when
+    report = tuned_repo.maintain(budget_ms=1000)
+    # then
+    assert report[0].name == 'analyze'
+    assert report[0].detail == 'analyze'
+    assert report[0].duration_ms >= 0
+    assert all(step.name != 'analyze' for step in tuned_repo.maintain(budget_ms=1000))
+
+
+def test_incremental_vacuum(tuned_repo):
+    # given
+    bucket = fill(tuned_repo)
+    for i in range(1000):
+        bucket.delete(i)
+    # when
+    report = tuned_repo.maintain(budget_ms=1000)
+    # then
+    assert any(step.name == 'vacuum' for step in report)
+    assert tuned_repo._db_.conn.execute('pragma freelist_count').fetchone()[0] == 0
+
+
+def test_wal_checkpoint(tuned_repo):
+    # given
+    fill(tuned_repo)
+    tuned_repo.maintenance.truncate_pages = 1
+    # when
+    report = tuned_repo.maintain(budget_ms=1000)
+    # then
+    checkpoint = [step for step in report if step.name == 'checkpoint']
+    assert checkpoint[0].detail.startswith('truncated wal')
+
+
+def test_budget(tuned_repo):
+    # given
+    fill(tuned_repo)
+    # when
+    report = tuned_repo.maintain(budget_ms=0)
+    # then
+    assert report == []
+
+
+def test_background(tempdir):
+    # given
+    with Repository(path.join(tempdir, 'test.ldb'), profile='write_heavy', maintenance_interval=0.01) as repo:
+        repo.maintenance.analyze_after = 100
+        fill(repo)
+        # when
+        deadline = time.time() + 5
+        while not repo.maintenance.last_report and time.time() < deadline:
+            time.sleep(0.01)
+        # then
+        assert repo.maintenance.is_running
+        assert repo.maintenance.last_report
+    assert not repo.maintenance.is_running
@@ -0,0 +1,45 @@
+from os import path
+
+import pytest
+
+from litedb import InvalidTuning, Repository
+
+
+def test_default(tempdir):
+    # when
+    with Repository(path.join(tempdir, 'test.ldb')) as repo:
+        # then
+        assert repo.settings['journal_mode'] == 'delete'
+        assert repo.settings['mmap_size'] == 0
+
+
+def test_profile(tempdir):
+    # when
+    with Repository(path.join(tempdir, 'test.ldb'), profile='read_heavy') as repo:
+        # then
+        settings = repo.settings
+        assert settings['journal_mode'] == 'wal'
+        assert settings['synchronous'] == 1
+        assert settings['cache_size'] == -64 * 1024
+        assert settings['mmap_size'] == 256 * 1024 * 1024
+        assert settings['temp_store'] == 2
+
+
+def test_override(tempdir):
+    # when
+    with Repository(path.join(tempdir, 'test.ldb'), profile='bulk_load', pragmas={'page_size': 8192}) as repo:
+        # then
+        assert repo.settings['page_size'] == 8192
+        assert repo.settings['synchronous'] == 0
+
+
+def test_invalid_profile():
+    with pytest.raises(InvalidTuning):
+        Repository(profile='fastest')
+
+
+def test_invalid_setting():
+    with pytest.raises(InvalidTuning):
+        Repository(pragmas={'foreign_keys': 1})
+    with pytest.raises(InvalidTuning):
+        Repository(pragmas={'journal_mode': 'wal; drop table x'})